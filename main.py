@@ -1,409 +1,2113 @@
 import requests
+from requests.adapters import HTTPAdapter
+import argparse
+import asyncio
+import bisect
+from concurrent.futures import ThreadPoolExecutor
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+import functools
+import hashlib
+import hmac
 import json
 from datetime import datetime, timedelta
 import os
+import queue
+import random
+import socket
+import sqlite3
+import string
 import time # Import the time module for sleep functionality
 from dotenv import load_dotenv
-import schedule
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request
+from collections import OrderedDict, namedtuple
 import threading
 import pytz
 
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
 # Load environment variables
 load_dotenv()
 
-class NotionTelegramBot:
-    def __init__(self):
-        # Konfigurasi API Keys
-        self.notion_token = os.getenv('NOTION_TOKEN')
-        self.telegram_bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
-        self.telegram_chat_id = os.getenv('TELEGRAM_CHAT_ID')
-        self.notion_database_id = os.getenv('NOTION_DATABASE_ID')
-        # Konfigurasi timezone, default ke UTC jika tidak diset
-        self.timezone = pytz.timezone(os.getenv('TIMEZONE', 'UTC'))
-        # Allow multiple reminder offsets, comma-separated. Default to [0] for today.
-        reminder_offsets_str = os.getenv('REMINDER_OFFSET_DAYS', '0')
-        self.reminder_offset_days = [int(x.strip()) for x in reminder_offsets_str.split(',') if x.strip().lstrip('-').isdigit()]
-        if not self.reminder_offset_days: # Fallback if parsing fails
-            self.reminder_offset_days = [0]
-
-        # Configure weekly holidays (e.g., "Saturday,Sunday")
-        weekly_holidays_str = os.getenv('WEEKLY_HOLIDAYS', '')
-        self.weekly_holidays = [day.strip().lower() for day in weekly_holidays_str.split(',') if day.strip()]
-        self.send_on_holidays = os.getenv('SEND_ON_HOLIDAYS', 'False').lower() == 'true'
-
-        # Headers untuk Notion API
-        self.notion_headers = {
-            'Authorization': f'Bearer {self.notion_token}',
-            'Content-Type': 'application/json',
-            'Notion-Version': '2022-06-28'
-        }
+# Tracked task fields: default Notion property name and the property type it is read as
+TASK_PROPERTIES = {
+    'title': ('Task Name', 'title'),
+    'category': ('Category', 'select'),
+    'assignee': ('Assignee', 'people'),
+    'due_date': ('Due Date', 'date'),
+    'status': ('Status', 'status'),
+    'priority': ('Priority', 'select'),
+    'description': ('Description', 'rich_text'),
+    'progress': ('Progress', 'number'),
+}
+# Fields that fall back to the first property of their type when the default name is not in the schema
+SCHEMA_RESOLVED_FIELDS = ('title', 'due_date', 'status', 'assignee')
+# Seconds to wait before retrying a failed schema fetch
+SCHEMA_RETRY_DELAY = 60
+# Bumped whenever the way snapshot values are extracted changes, so stored snapshots can be refreshed silently
+SNAPSHOT_VERSION = 2
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    # repr keeps every significant digit, so large sums such as histogram _sum values stay exact
+    if isinstance(value, float):
+        if value != value:
+            return 'NaN'
+        if value in (float('inf'), float('-inf')):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    TYPE = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, _format_labels(self.labelnames, key), value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    """Gauge read from a callback at scrape time."""
+
+    TYPE = 'gauge'
+
+    def __init__(self, name, documentation):
+        super().__init__(name, documentation)
+        self._func = None
+
+    def set_function(self, func):
+        self._func = func
+
+    def samples(self):
+        if self._func is None:
+            return []
+        return [(self.name, '', self._func())]
+
+
+class Histogram(Counter):
+    """Histogram with fixed cumulative buckets and optional labels."""
+
+    TYPE = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One slot per bucket, one for +Inf, then the sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the wall-clock duration of the with-block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(counts)) for key, counts in self._values.items())
+        samples = []
+        for key, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                samples.append((self.name + '_bucket', _format_labels(self.labelnames, key, [('le', le)]), cumulative))
+            samples.append((self.name + '_count', _format_labels(self.labelnames, key), cumulative))
+            samples.append((self.name + '_sum', _format_labels(self.labelnames, key), counts[-1]))
+        return samples
+
+
+class MetricsRegistry:
+    """Collects metrics and renders them in the Prometheus text exposition format."""
 
-        # State management for change detection
-        self.state_file = 'notion_state.json'
-        self.last_known_state = self._load_state()
-        # Determine if this is the initial run (no prior state loaded)
-        self.is_initial_run = not bool(self.last_known_state)
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation):
+        return self.register(Gauge(name, documentation))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=Histogram.DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.TYPE}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def timed(histogram, **labels):
+    """Decorator observing every call of the wrapped function in `histogram`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Metrics served on /metrics
+METRICS = MetricsRegistry()
+API_REQUEST_SECONDS = METRICS.histogram('notion_bot_api_request_seconds', "Duration of single HTTP attempts to an API", ['api'])
+API_RATE_LIMITED = METRICS.counter('notion_bot_api_rate_limited_total', "HTTP 429 responses received from an API", ['api'])
+NOTION_QUERY_SECONDS = METRICS.histogram('notion_bot_notion_query_seconds', "Duration of one Notion database query batch, including retries")
+POLL_PAGES = METRICS.histogram('notion_bot_poll_pages', "Pages returned by one change check", ['mode'],
+                               buckets=(0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000))
+DIFF_SECONDS = METRICS.histogram('notion_bot_diff_seconds', "Time spent diffing pages against the stored state in one change check")
+STATE_SAVE_SECONDS = METRICS.histogram('notion_bot_state_save_seconds', "Duration of saving changed state rows together with their notifications")
+RENDER_SECONDS = METRICS.histogram('notion_bot_render_seconds', "Duration of rendering one notification", ['kind'],
+                                   buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01))
+TELEGRAM_SEND_SECONDS = METRICS.histogram('notion_bot_telegram_send_seconds', "Duration of sending one Telegram message, including retries")
+TELEGRAM_SEND_FAILURES = METRICS.counter('notion_bot_telegram_send_failures_total', "Telegram messages that could not be sent")
+JOB_SECONDS = METRICS.histogram('notion_bot_job_seconds', "Duration of one run of a scheduled job for one database", ['job'],
+                                buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600))
+OUTBOX_PENDING = METRICS.gauge('notion_bot_outbox_pending', "Notifications waiting in the outbox")
+DISPATCH_QUEUE_DEPTH = METRICS.gauge('notion_bot_dispatch_queue_depth', "Notification batches queued for the sender threads")
+ENRICHMENT_CACHE = METRICS.counter('notion_bot_enrichment_cache_total', "Reminder enrichment cache lookups", ['result'])
+
+class TokenBucket:
+    """Thread-safe token bucket: allows `rate` acquisitions per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then takes it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ApiClient:
+    """Pooled HTTP session for one API with timeouts, rate limiting and retries.
+
+    Requests are retried on connection errors, HTTP 429 and 5xx responses, honouring Retry-After
+    when the server sends one and falling back to exponential backoff with full jitter otherwise.
+    """
+
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+    def __init__(self, name, rate, headers=None, key_rate=None, timeout=30, max_retries=5,
+                 backoff_base=0.5, backoff_max=30, pool_size=10):
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = TokenBucket(rate)
+        # Optional secondary limit per key (e.g. per Telegram chat)
+        self.key_rate = key_rate
+        self._key_limiters = {}
+        self._key_limiters_lock = threading.Lock()
+
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _limiter_for(self, key):
+        with self._key_limiters_lock:
+            limiter = self._key_limiters.get(key)
+            if limiter is None:
+                limiter = self._key_limiters[key] = TokenBucket(self.key_rate, capacity=1)
+            return limiter
+
+    def _backoff_delay(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _retry_after(response):
+        """Returns the server-requested delay in seconds, if any (Retry-After header or Telegram's parameters.retry_after)."""
+        header = response.headers.get('Retry-After')
+        if header:
+            try:
+                return float(header)
+            except ValueError:
+                pass
+        try:
+            return float(response.json().get('parameters', {}).get('retry_after'))
+        except (ValueError, TypeError, AttributeError):
+            return None
 
-    def _load_state(self):
-        """Loads the last known state from a JSON file, validating its structure."""
-        if os.path.exists(self.state_file):
-            with open(self.state_file, 'r') as f:
+    def request(self, method, url, limit_key=None, **kwargs):
+        """Sends a request and returns the response, raising requests.exceptions.RequestException once retries are exhausted."""
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            if limit_key is not None and self.key_rate:
+                self._limiter_for(limit_key).acquire()
+
+            try:
+                with API_REQUEST_SECONDS.time(api=self.name):
+                    response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                print(f"⚠️ {self.name}: {e.__class__.__name__}, mencoba lagi dalam {delay:.1f} detik...")
+            else:
+                if response.status_code == 429:
+                    API_RATE_LIMITED.inc(api=self.name)
+                if response.status_code not in self.RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff_delay(attempt)
+                print(f"⚠️ {self.name}: HTTP {response.status_code}, mencoba lagi dalam {delay:.1f} detik...")
+
+            attempt += 1
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+# Telegram rejects messages longer than this many characters
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+# A message headed for the outbox. `event` optionally describes the task change behind it
+# ({"kind": "new" | "changed" | "deleted", "page_id", "old", "new"}), so digests can merge repeated edits.
+OutgoingMessage = namedtuple('OutgoingMessage', ['chat_id', 'text', 'description', 'event'], defaults=(None, None))
+OutboxRow = namedtuple('OutboxRow', ['id', 'chat_id', 'text', 'description', 'attempts', 'event', 'created_at'])
+
+
+class MessageOutbox:
+    """SQLite-backed outbox of Telegram messages awaiting delivery.
+
+    Messages are written here before the change state is saved and deleted only once Telegram
+    accepted them, so a failed send or a crash never loses a notification (at-least-once delivery).
+    """
+
+    def __init__(self, path, max_attempts=20):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    description TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    dead INTEGER NOT NULL DEFAULT 0,
+                    event TEXT
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (dead, next_attempt_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_chat ON outbox (chat_id, id)")
+            # Outboxes created before digests were supported lack the event column
+            if 'event' not in [column[1] for column in self._conn.execute("PRAGMA table_info(outbox)")]:
+                self._conn.execute("ALTER TABLE outbox ADD COLUMN event TEXT")
+
+    @contextmanager
+    def transaction(self):
+        """Yields the connection inside a locked transaction, so other tables in the same file can commit atomically with the outbox."""
+        with self._lock, self._conn:
+            yield self._conn
+
+    def insert(self, conn, messages):
+        """Records OutgoingMessage (or plain (chat_id, text, description)) tuples using a connection obtained from transaction()."""
+        now = time.time()
+        rows = []
+        for message in messages:
+            message = OutgoingMessage(*message)
+            event = json.dumps(message.event) if message.event else None
+            rows.append((str(message.chat_id), message.text, message.description, now, now, event))
+        conn.executemany(
+            "INSERT INTO outbox (chat_id, text, description, next_attempt_at, created_at, event) VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+    def add_many(self, messages):
+        """Durably records OutgoingMessage tuples in one transaction."""
+        with self.transaction() as conn:
+            self.insert(conn, messages)
+
+    def due(self, exclude_ids=(), limit=500):
+        """Returns OutboxRow tuples whose next attempt is due, oldest first.
+
+        Rows queued behind an earlier message of the same chat that is waiting to be retried are held
+        back, so a chat never receives its messages out of order.
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, chat_id, text, description, attempts, event, created_at FROM outbox AS o "
+                "WHERE dead = 0 AND next_attempt_at <= ? AND NOT EXISTS ("
+                "SELECT 1 FROM outbox AS earlier WHERE earlier.chat_id = o.chat_id AND earlier.id < o.id "
+                "AND earlier.dead = 0 AND earlier.next_attempt_at > ?) ORDER BY id LIMIT ?",
+                (now, now, limit + len(exclude_ids)),
+            ).fetchall()
+        return [OutboxRow(*row) for row in rows if row[0] not in exclude_ids][:limit]
+
+    def mark_sent(self, message_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM outbox WHERE id = ?", (message_id,))
+
+    def mark_failed(self, message_id, attempts, retry_delay):
+        """Schedules another attempt, or parks the message once max_attempts is reached."""
+        dead = 1 if self.max_attempts and attempts >= self.max_attempts else 0
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ?, dead = ? WHERE id = ?",
+                (attempts, time.time() + retry_delay, dead, message_id),
+            )
+        return bool(dead)
+
+    def pending(self):
+        """Returns the number of messages still awaiting delivery."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE dead = 0").fetchone()[0]
+
+
+def _decode_text(segments):
+    # Join every segment; mentions and equations only carry plain_text
+    text = ''.join(segment.get('plain_text') or segment.get('text', {}).get('content', '') for segment in segments)
+    return text or None
+
+
+def _decode_name(value):
+    return value.get('name', 'N/A') if value else None
+
+
+# Decoders for each Notion property type; they return None when the property holds no value
+PROPERTY_DECODERS = {
+    'title': lambda prop: _decode_text(prop.get('title') or []),
+    'rich_text': lambda prop: _decode_text(prop.get('rich_text') or []),
+    'date': lambda prop: (prop.get('date') or {}).get('start'),
+    'select': lambda prop: _decode_name(prop.get('select')),
+    'status': lambda prop: _decode_name(prop.get('status')),
+    'multi_select': lambda prop: ", ".join(option.get('name', 'N/A') for option in prop.get('multi_select') or []) or None,
+    'people': lambda prop: ", ".join(person.get('name', 'N/A') for person in prop.get('people') or []) or None,
+    'number': lambda prop: str(prop.get('number', 'N/A')),
+    'checkbox': lambda prop: str(prop.get('checkbox')),
+    'url': lambda prop: prop.get('url'),
+    'email': lambda prop: prop.get('email'),
+    'phone_number': lambda prop: prop.get('phone_number'),
+}
+
+
+class PropertyExtractor:
+    """Reads the tracked task fields from page properties through decoders compiled once per database schema.
+
+    Each field is bound to its property name and the decoder for that property's type, so extracting a
+    page is a single pass over a flat list instead of a string-compared type ladder per property.
+    """
+
+    def __init__(self, property_names, schema_properties=None):
+        schema_properties = schema_properties or {}
+        self._extractors = []
+        self._by_field = {}
+        for field, (_, default_type) in TASK_PROPERTIES.items():
+            name = property_names.get(field)
+            prop_type = (schema_properties.get(name) or {}).get('type', default_type)
+            missing = 'Untitled Task' if field == 'title' else 'N/A'
+            extractor = (name, PROPERTY_DECODERS.get(prop_type, lambda prop: None), missing)
+            self._extractors.append(extractor)
+            self._by_field[field] = extractor
+
+    @staticmethod
+    def _run(properties, extractor):
+        name, decode, missing = extractor
+        prop_data = properties.get(name) if name else None
+        if not prop_data:
+            return missing
+        value = decode(prop_data)
+        return missing if value is None else value
+
+    def values(self, properties):
+        """Returns every tracked field value in TASK_PROPERTIES (and TaskSnapshot.FIELDS) order."""
+        return tuple(self._run(properties, extractor) for extractor in self._extractors)
+
+    def get(self, properties, field):
+        """Returns a single tracked field value."""
+        return self._run(properties, self._by_field[field])
+
+
+class TaskSnapshot:
+    """Compact snapshot of the tracked fields of a task, with a content digest for cheap comparisons.
+
+    Two snapshots with the same digest are treated as unchanged; last_edited_time is left out
+    of the digest because Notion bumps it for edits to properties that are not tracked.
+    """
+
+    FIELDS = ('title', 'category', 'assignee', 'due_date', 'status', 'priority', 'description', 'progress')
+    __slots__ = ('last_edited_time', 'url') + FIELDS + ('digest',)
+
+    def __init__(self, last_edited_time, url, title, category, assignee, due_date, status, priority, description, progress):
+        self.last_edited_time = last_edited_time
+        self.url = url
+        self.title = title
+        self.category = category
+        self.assignee = assignee
+        self.due_date = due_date
+        self.status = status
+        self.priority = priority
+        self.description = description
+        self.progress = progress
+        self.digest = hashlib.blake2b('\x1f'.join((url,) + self.values()).encode('utf-8'), digest_size=8).hexdigest()
+
+    def values(self):
+        """Returns the tracked field values in FIELDS order."""
+        return (self.title, self.category, self.assignee, self.due_date, self.status, self.priority, self.description, self.progress)
+
+    def to_row(self):
+        return [self.last_edited_time, self.url, *self.values()]
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+    def to_dict(self):
+        """Returns the notion_state.json representation of the snapshot."""
+        return {'last_edited_time': self.last_edited_time, 'url': self.url, **dict(zip(self.FIELDS, self.values()))}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state.get('last_edited_time', ''), state.get('url', '#'), *(str(state.get(field, 'N/A')) for field in cls.FIELDS))
+
+    def changes_from(self, old):
+        """Returns (field, old_value, new_value) for every tracked field that differs from `old`."""
+        return [(field, old_value, new_value) for field, old_value, new_value in zip(self.FIELDS, old.values(), self.values()) if old_value != new_value]
+
+
+class StateStore(ABC):
+    """Interface for the last known TaskSnapshot of every tracked task, keyed by page id."""
+
+    @abstractmethod
+    def get(self, page_id):
+        """Returns the stored snapshot for a page, or None if the page is unknown."""
+
+    def get_digest(self, page_id):
+        """Returns the digest of the stored snapshot for a page, or None if the page is unknown."""
+        snapshot = self.get(page_id)
+        return snapshot.digest if snapshot else None
+
+    @abstractmethod
+    def page_ids(self):
+        """Returns the ids of every stored page."""
+
+    @abstractmethod
+    def is_empty(self):
+        """Returns True when no page is stored."""
+
+    @abstractmethod
+    def high_water_mark(self):
+        """Returns the newest stored last_edited_time, or None if the store is empty."""
+
+    @abstractmethod
+    def commit(self, upserts, deletes=(), messages=()):
+        """Atomically applies changed snapshots, removes deleted pages and queues (chat_id, text, description) messages."""
+
+    def snapshot_version(self):
+        """Returns the SNAPSHOT_VERSION the stored snapshots were extracted with."""
+        return SNAPSHOT_VERSION
+
+    def set_snapshot_version(self, version):
+        """Records that every stored snapshot has been refreshed with `version`."""
+
+    def export_json(self, path):
+        """Writes every stored snapshot to a JSON file in the notion_state.json format."""
+        with open(path + '.tmp', 'w') as f:
+            json.dump({page_id: self.get(page_id).to_dict() for page_id in self.page_ids()}, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def import_json(self, path):
+        """Replaces the stored states with the contents of a notion_state.json file. Returns the number of pages imported."""
+        state = JsonStateStore.read_file(path)
+        self.commit(state, deletes=[page_id for page_id in self.page_ids() if page_id not in state])
+        if state:
+            # The file does not say which rules extracted its snapshots, so the next full sync refreshes them silently
+            self.set_snapshot_version(1)
+        return len(state)
+
+
+class JsonStateStore(StateStore):
+    """Legacy backend keeping the whole state in memory and rewriting a JSON file on every commit."""
+
+    def __init__(self, path, outbox):
+        self.path = path
+        self.outbox = outbox
+        self._state = self.read_file(path)
+        # The snapshot version is kept next to the outbox, keyed by the state file instead of a database id
+        self._meta_key = 'json:' + os.path.abspath(path)
+        with outbox.transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS state_meta (database_id TEXT PRIMARY KEY, snapshot_version INTEGER NOT NULL)")
+            # An existing file predates version tracking and was extracted with the first version
+            conn.execute("INSERT OR IGNORE INTO state_meta (database_id, snapshot_version) VALUES (?, ?)",
+                         (self._meta_key, 1 if self._state else SNAPSHOT_VERSION))
+
+    @staticmethod
+    def read_file(path):
+        """Loads a state JSON file into snapshots, validating its structure."""
+        if os.path.exists(path):
+            with open(path, 'r') as f:
                 try:
                     state = json.load(f)
                     # Validate that all values in the state are dictionaries
                     if isinstance(state, dict) and all(isinstance(v, dict) for v in state.values()):
-                        return state
+                        return {page_id: TaskSnapshot.from_dict(task_state) for page_id, task_state in state.items()}
                     else:
-                        print(f"Warning: State file {self.state_file} contains invalid data format or is not a dictionary. Resetting state.")
+                        print(f"Warning: State file {path} contains invalid data format or is not a dictionary. Resetting state.")
                         return {}
                 except json.JSONDecodeError:
-                    print(f"Warning: Could not decode JSON from {self.state_file}. Starting with empty state.")
+                    print(f"Warning: Could not decode JSON from {path}. Starting with empty state.")
                     return {}
         return {}
 
-    def _save_state(self):
-        """Saves the current state to a JSON file."""
-        with open(self.state_file, 'w') as f:
-            json.dump(self.last_known_state, f, indent=2)
-
-    def _get_simplified_task_state(self, task):
-        """Extracts key properties from a Notion task for state comparison."""
-        properties = task['properties']
-        simplified_state = {
-            'last_edited_time': task['last_edited_time'],
-            'url': task['url'], # Include URL here
-            'title': self.get_task_title(task), # Re-use existing helper
-            'category': self._get_property_value_safe(properties, "Category", "select"),
-            'assignee': self._get_property_value_safe(properties, "Assignee", "people"),
-            'due_date': self._get_property_value_safe(properties, "Due Date", "date"),
-            'status': self._get_property_value_safe(properties, "Status", "status"),
-            'priority': self._get_property_value_safe(properties, "Priority", "select"),
-            'description': self._get_property_value_safe(properties, "Description", "rich_text"),
-            'progress': self._get_property_value_safe(properties, "Progress", "number"),
+    def get(self, page_id):
+        return self._state.get(page_id)
+
+    def page_ids(self):
+        return list(self._state)
+
+    def is_empty(self):
+        return not self._state
+
+    def high_water_mark(self):
+        return max((snapshot.last_edited_time for snapshot in self._state.values()), default=None)
+
+    def snapshot_version(self):
+        with self.outbox.transaction() as conn:
+            return conn.execute("SELECT snapshot_version FROM state_meta WHERE database_id = ?", (self._meta_key,)).fetchone()[0]
+
+    def set_snapshot_version(self, version):
+        with self.outbox.transaction() as conn:
+            conn.execute("UPDATE state_meta SET snapshot_version = ? WHERE database_id = ?", (version, self._meta_key))
+
+    def commit(self, upserts, deletes=(), messages=()):
+        # The outbox lives in SQLite, so it is written first; a crash before the file is
+        # replaced re-detects the changes on the next poll instead of losing them
+        if messages:
+            self.outbox.add_many(messages)
+        self._state.update(upserts)
+        for page_id in deletes:
+            self._state.pop(page_id, None)
+        # Write to a temporary file and rename it, so a crash never leaves a torn state file
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump({page_id: snapshot.to_dict() for page_id, snapshot in self._state.items()}, f, indent=2)
+        os.replace(self.path + '.tmp', self.path)
+
+
+class SqliteStateStore(StateStore):
+    """SQLite backend storing one row per page in the same database file as the outbox.
+
+    Every watched database gets its own store instance, scoped by database_id over a shared table.
+    Only changed rows are written, and they are committed in the same transaction as the
+    notifications they produced. Snapshots are read lazily, and the digest column lets
+    unchanged pages be rejected without decoding the stored state.
+    """
+
+    def __init__(self, outbox, database_id, claim_unscoped_rows=False):
+        self.outbox = outbox
+        self.database_id = database_id
+        with outbox.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS task_state (
+                    page_id TEXT PRIMARY KEY,
+                    last_edited_time TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    digest TEXT,
+                    database_id TEXT
+                )
+            """)
+            # Databases created by older versions lack the digest and database_id columns
+            columns = [column[1] for column in conn.execute("PRAGMA table_info(task_state)")]
+            if 'digest' not in columns:
+                conn.execute("ALTER TABLE task_state ADD COLUMN digest TEXT")
+            if 'database_id' not in columns:
+                conn.execute("ALTER TABLE task_state ADD COLUMN database_id TEXT")
+            conn.execute("DROP INDEX IF EXISTS task_state_last_edited")
+            conn.execute("CREATE INDEX IF NOT EXISTS task_state_database ON task_state (database_id, last_edited_time)")
+            if claim_unscoped_rows:
+                # Rows written while only one database was supported belong to that database
+                conn.execute("UPDATE task_state SET database_id = ? WHERE database_id IS NULL", (database_id,))
+            conn.execute("CREATE TABLE IF NOT EXISTS state_meta (database_id TEXT PRIMARY KEY, snapshot_version INTEGER NOT NULL)")
+            if conn.execute("SELECT 1 FROM state_meta WHERE database_id = ?", (database_id,)).fetchone() is None:
+                # Existing rows predate version tracking and were extracted with the first version
+                has_rows = conn.execute("SELECT 1 FROM task_state WHERE database_id = ? LIMIT 1", (database_id,)).fetchone()
+                conn.execute("INSERT INTO state_meta (database_id, snapshot_version) VALUES (?, ?)",
+                             (database_id, 1 if has_rows else SNAPSHOT_VERSION))
+            stale_rows = conn.execute("SELECT page_id, state FROM task_state WHERE digest IS NULL").fetchall()
+            conn.executemany(
+                "UPDATE task_state SET state = ?, digest = ? WHERE page_id = ?",
+                [(json.dumps(snapshot.to_row()), snapshot.digest, page_id)
+                 for page_id, snapshot in ((page_id, self._decode(state)) for page_id, state in stale_rows)],
+            )
+
+    @staticmethod
+    def _decode(state):
+        data = json.loads(state)
+        # Rows written before snapshots were introduced hold the full state dict
+        return TaskSnapshot.from_dict(data) if isinstance(data, dict) else TaskSnapshot.from_row(data)
+
+    def get(self, page_id):
+        with self.outbox.transaction() as conn:
+            row = conn.execute("SELECT state FROM task_state WHERE database_id = ? AND page_id = ?", (self.database_id, page_id)).fetchone()
+        return self._decode(row[0]) if row else None
+
+    def get_digest(self, page_id):
+        with self.outbox.transaction() as conn:
+            row = conn.execute("SELECT digest FROM task_state WHERE database_id = ? AND page_id = ?", (self.database_id, page_id)).fetchone()
+        return row[0] if row else None
+
+    def page_ids(self):
+        with self.outbox.transaction() as conn:
+            return [row[0] for row in conn.execute("SELECT page_id FROM task_state WHERE database_id = ?", (self.database_id,))]
+
+    def is_empty(self):
+        with self.outbox.transaction() as conn:
+            return conn.execute("SELECT 1 FROM task_state WHERE database_id = ? LIMIT 1", (self.database_id,)).fetchone() is None
+
+    def high_water_mark(self):
+        with self.outbox.transaction() as conn:
+            return conn.execute("SELECT MAX(last_edited_time) FROM task_state WHERE database_id = ?", (self.database_id,)).fetchone()[0]
+
+    def snapshot_version(self):
+        with self.outbox.transaction() as conn:
+            return conn.execute("SELECT snapshot_version FROM state_meta WHERE database_id = ?", (self.database_id,)).fetchone()[0]
+
+    def set_snapshot_version(self, version):
+        with self.outbox.transaction() as conn:
+            conn.execute("UPDATE state_meta SET snapshot_version = ? WHERE database_id = ?", (version, self.database_id))
+
+    def commit(self, upserts, deletes=(), messages=()):
+        with self.outbox.transaction() as conn:
+            if messages:
+                self.outbox.insert(conn, messages)
+            conn.executemany(
+                "INSERT OR REPLACE INTO task_state (page_id, last_edited_time, state, digest, database_id) VALUES (?, ?, ?, ?, ?)",
+                [(page_id, snapshot.last_edited_time, json.dumps(snapshot.to_row()), snapshot.digest, self.database_id)
+                 for page_id, snapshot in upserts.items()],
+            )
+            conn.executemany(
+                "DELETE FROM task_state WHERE database_id = ? AND page_id = ?",
+                [(self.database_id, page_id) for page_id in deletes],
+            )
+
+
+class ReminderLedger:
+    """Reminders already queued, keyed by (database, page id, offset, due date), so repeated runs don't resend them.
+
+    Entries are written in the same transaction as the outbox rows of their reminders and expire
+    after `retention` seconds; a key can only come up again on the day it was sent.
+    """
+
+    def __init__(self, outbox, database_id, retention=2 * 24 * 3600):
+        self.outbox = outbox
+        self.database_id = database_id
+        self.retention = retention
+        with outbox.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sent_reminders (
+                    database_id TEXT NOT NULL,
+                    page_id TEXT NOT NULL,
+                    offset_days INTEGER NOT NULL,
+                    due_date TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (database_id, page_id, offset_days, due_date)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS sent_reminders_expiry ON sent_reminders (expires_at)")
+
+    def sent(self):
+        """Returns the (page_id, offset, due_date) keys of every unexpired reminder of this database."""
+        with self.outbox.transaction() as conn:
+            rows = conn.execute(
+                "SELECT page_id, offset_days, due_date FROM sent_reminders WHERE database_id = ? AND expires_at >= ?",
+                (self.database_id, time.time()),
+            )
+            return {tuple(row) for row in rows}
+
+    def record(self, keys, messages):
+        """Queues the reminder messages and records their (page_id, offset, due_date) keys atomically."""
+        now = time.time()
+        with self.outbox.transaction() as conn:
+            if messages:
+                self.outbox.insert(conn, messages)
+            conn.executemany(
+                "INSERT OR REPLACE INTO sent_reminders (database_id, page_id, offset_days, due_date, expires_at) VALUES (?, ?, ?, ?, ?)",
+                [(self.database_id, page_id, offset, due_date, now + self.retention) for page_id, offset, due_date in keys],
+            )
+            conn.execute("DELETE FROM sent_reminders WHERE expires_at < ?", (now,))
+
+
+class WebhookInbox:
+    """Webhook events received by a worker that does not own the event's database, waiting for the owner.
+
+    Events are kept in the outbox database, which every worker shares through STATE_DB_PATH, so a
+    load balancer may deliver a webhook to any worker without the change waiting for the owner's
+    next reconciliation.
+    """
+
+    def __init__(self, outbox):
+        self.outbox = outbox
+        with outbox.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS webhook_inbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    database_id TEXT NOT NULL,
+                    event TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS webhook_inbox_database ON webhook_inbox (database_id, id)")
+
+    def forward(self, database_id, event):
+        """Stores an event for the worker owning `database_id`."""
+        with self.outbox.transaction() as conn:
+            conn.execute("INSERT INTO webhook_inbox (database_id, event, created_at) VALUES (?, ?, ?)",
+                         (database_id, json.dumps(event), time.time()))
+
+    def take(self, database_id):
+        """Removes and returns the events forwarded for `database_id`, oldest first."""
+        with self.outbox.transaction() as conn:
+            rows = conn.execute("SELECT id, event FROM webhook_inbox WHERE database_id = ? ORDER BY id", (database_id,)).fetchall()
+            if rows:
+                conn.execute("DELETE FROM webhook_inbox WHERE database_id = ? AND id <= ?", (database_id, rows[-1][0]))
+        return [json.loads(event) for _, event in rows]
+
+
+# Characters that must be escaped everywhere in Telegram MarkdownV2 text, in code spans and in link URLs
+MARKDOWN_V2_ESCAPES = str.maketrans({char: '\\' + char for char in '\\_*[]()~`>#+-=|{}.!'})
+MARKDOWN_V2_CODE_ESCAPES = str.maketrans({'\\': '\\\\', '`': '\\`'})
+MARKDOWN_V2_URL_ESCAPES = str.maketrans({'\\': '\\\\', ')': '\\)'})
+
+
+def escape_markdown(text):
+    """Escapes text for Telegram MarkdownV2 in a single pass."""
+    return str(text).translate(MARKDOWN_V2_ESCAPES)
+
+
+# Notification templates per locale, written in Telegram MarkdownV2 (literal text is already escaped).
+# {field} is escaped as text, {field!c} as code span contents, {field!u} as a link URL and {field!r} is
+# inserted unchanged. Task templates receive every TaskSnapshot field plus `url`.
+MESSAGE_TEMPLATES = {
+    'id': {
+        'task': (
+            "📋 *Tugas:* {title}\n"
+            "🔗 *Link:* [Buka di Notion]({url!u})\n"
+            "\\-\\-\\- Detail Tugas \\-\\-\\-\n"
+            "🗓️ *Tenggat:* {due_date}\n"
+            "🏷️ *Kategori:* {category}\n"
+            "👤 *Ditugaskan Kepada:* {assignee}\n"
+            "📊 *Status:* {status}\n"
+            "❗ *Prioritas:* {priority}\n"
+            "📈 *Progress:* {progress}%\n"
+        ),
+        'description': "📝 *Deskripsi:* {description}\n",
+        'reminder': "🔔 *Pengingat Tugas Notion*\n\n{task!r}{description_line!r}{enrichment!r}\n⏰ {footer!r}",
+        'excerpt': "📄 *Isi Halaman:* {excerpt}\n",
+        'related': "📁 *{label}:* {titles}\n",
+        'reminder_today': "Jangan lupa untuk menyelesaikan tugas ini hari ini\\!",
+        'reminder_upcoming': "Pengingat: Tugas ini jatuh tempo dalam {days} hari\\!",
+        'reminder_overdue': "Pengingat: Tugas ini sudah lewat {days} hari\\!",
+        'reminder_generic': "Pengingat tugas\\!",
+        'new': "✨ *Tugas Baru Ditambahkan di Notion*\n\n{task!r}{description_line!r}",
+        'changed': (
+            "✏️ *Perubahan Tugas di Notion*\n\n"
+            "📋 *Tugas:* {title}\n"
+            "🔗 *Link:* [Buka di Notion]({url!u})\n"
+            "\\-\\-\\- Detail Perubahan \\-\\-\\-\n"
+            "{changes!r}"
+        ),
+        'change_line': "\\- *{label}:* `{old!c}` ➡️ `{new!c}`",
+        'deleted': "🗑️ *Tugas Dihapus di Notion*\n\n📋 *Tugas:* {title}\nTugas ini telah dihapus dari database Notion\\.",
+        'digest_header': "📬 *Ringkasan Notion* \\({count} pembaruan\\)\n\n",
+        'holiday': "🎉 Hari ini adalah hari libur mingguan \\({day}\\)\\. Tidak ada pengingat yang akan dikirim\\.",
+        'labels': {
+            'title': 'Title', 'category': 'Category', 'assignee': 'Assignee', 'due_date': 'Due Date',
+            'status': 'Status', 'priority': 'Priority', 'description': 'Description', 'progress': 'Progress',
+        },
+    },
+    'en': {
+        'task': (
+            "📋 *Task:* {title}\n"
+            "🔗 *Link:* [Open in Notion]({url!u})\n"
+            "\\-\\-\\- Task Details \\-\\-\\-\n"
+            "🗓️ *Due:* {due_date}\n"
+            "🏷️ *Category:* {category}\n"
+            "👤 *Assigned To:* {assignee}\n"
+            "📊 *Status:* {status}\n"
+            "❗ *Priority:* {priority}\n"
+            "📈 *Progress:* {progress}%\n"
+        ),
+        'description': "📝 *Description:* {description}\n",
+        'reminder': "🔔 *Notion Task Reminder*\n\n{task!r}{description_line!r}{enrichment!r}\n⏰ {footer!r}",
+        'excerpt': "📄 *Page Content:* {excerpt}\n",
+        'related': "📁 *{label}:* {titles}\n",
+        'reminder_today': "Don't forget to finish this task today\\!",
+        'reminder_upcoming': "Reminder: this task is due in {days} days\\!",
+        'reminder_overdue': "Reminder: this task is {days} days overdue\\!",
+        'reminder_generic': "Task reminder\\!",
+        'new': "✨ *New Task Added in Notion*\n\n{task!r}{description_line!r}",
+        'changed': (
+            "✏️ *Task Changed in Notion*\n\n"
+            "📋 *Task:* {title}\n"
+            "🔗 *Link:* [Open in Notion]({url!u})\n"
+            "\\-\\-\\- Changes \\-\\-\\-\n"
+            "{changes!r}"
+        ),
+        'change_line': "\\- *{label}:* `{old!c}` ➡️ `{new!c}`",
+        'deleted': "🗑️ *Task Deleted in Notion*\n\n📋 *Task:* {title}\nThis task was removed from the Notion database\\.",
+        'digest_header': "📬 *Notion Digest* \\({count} updates\\)\n\n",
+        'holiday': "🎉 Today is a weekly holiday \\({day}\\)\\. No reminders will be sent\\.",
+        'labels': {
+            'title': 'Title', 'category': 'Category', 'assignee': 'Assignee', 'due_date': 'Due Date',
+            'status': 'Status', 'priority': 'Priority', 'description': 'Description', 'progress': 'Progress',
+        },
+    },
+}
+
+
+class MessageTemplate:
+    """A MarkdownV2 template compiled once into a positional str.format pattern and per-field escapers."""
+
+    ESCAPES = {None: MARKDOWN_V2_ESCAPES, 'c': MARKDOWN_V2_CODE_ESCAPES, 'u': MARKDOWN_V2_URL_ESCAPES, 'r': None}
+
+    def __init__(self, source):
+        pattern = []
+        self.fields = []
+        for literal, field, _, conversion in string.Formatter().parse(source):
+            pattern.append(literal.replace('{', '{{').replace('}', '}}'))
+            if field is None:
+                continue
+            if conversion not in self.ESCAPES:
+                raise ValueError(f"Unknown template conversion '!{conversion}' for field '{field}'")
+            pattern.append(f"{{{len(self.fields)}}}")
+            self.fields.append((field, self.ESCAPES[conversion]))
+        self.pattern = ''.join(pattern)
+
+    def render(self, values):
+        """Fills the template from a mapping, escaping each value for its position."""
+        return self.pattern.format(*[values[field] if table is None else str(values[field]).translate(table)
+                                     for field, table in self.fields])
+
+
+class MessageRenderer:
+    """Renders every notification from MESSAGE_TEMPLATES, compiled once per locale and message kind."""
+
+    def __init__(self, default_locale='id', templates=MESSAGE_TEMPLATES):
+        self._templates = {
+            locale: {kind: MessageTemplate(source) for kind, source in kinds.items() if kind != 'labels'}
+            for locale, kinds in templates.items()
         }
-        return simplified_state
+        self._labels = {locale: kinds['labels'] for locale, kinds in templates.items()}
+        if default_locale not in self._templates:
+            print(f"⚠️ Locale '{default_locale}' tidak dikenal, menggunakan 'id'")
+            default_locale = 'id'
+        self.default_locale = default_locale
+
+    def locale_for(self, locale):
+        """Returns `locale` if templates exist for it, otherwise the default locale."""
+        return locale if locale in self._templates else self.default_locale
+
+    def render(self, kind, values, locale=None):
+        """Renders a single template of the given kind."""
+        with RENDER_SECONDS.time(kind=kind):
+            return self._templates[self.locale_for(locale)][kind].render(values)
+
+    def _task_values(self, templates, snapshot):
+        values = snapshot.to_dict()
+        values['task'] = templates['task'].render(values)
+        values['description_line'] = templates['description'].render(values) if snapshot.description != "N/A" else ''
+        return values
+
+    def _reminder_footer(self, templates, offset):
+        if offset is None:
+            return templates['reminder_generic'].render({})
+        if offset == 0:
+            return templates['reminder_today'].render({})
+        if offset < 0:
+            return templates['reminder_upcoming'].render({'days': abs(offset)})
+        return templates['reminder_overdue'].render({'days': offset})
+
+    def _enrichment_lines(self, templates, enrichment):
+        if not enrichment:
+            return ''
+        lines = [templates['related'].render({'label': label, 'titles': titles}) for label, titles in enrichment.get('related', ())]
+        if enrichment.get('excerpt'):
+            lines.append(templates['excerpt'].render(enrichment))
+        return ''.join(lines)
+
+    def render_reminders(self, snapshots, offset=None, locale=None, enrichments=None):
+        """Renders reminders for a batch of tasks sharing one offset; the footer is rendered only once.
+
+        `enrichments` optionally holds one PageEnricher result per snapshot.
+        """
+        templates = self._templates[self.locale_for(locale)]
+        footer = self._reminder_footer(templates, offset)
+        reminder = templates['reminder']
+        messages = []
+        for index, snapshot in enumerate(snapshots):
+            started = time.perf_counter()
+            values = self._task_values(templates, snapshot)
+            values['enrichment'] = self._enrichment_lines(templates, enrichments[index] if enrichments else None)
+            values['footer'] = footer
+            messages.append(reminder.render(values))
+            RENDER_SECONDS.observe(time.perf_counter() - started, kind='reminder')
+        return messages
+
+    def render_reminder(self, snapshot, offset=None, locale=None):
+        return self.render_reminders([snapshot], offset, locale)[0]
+
+    def render_new(self, snapshot, locale=None):
+        templates = self._templates[self.locale_for(locale)]
+        with RENDER_SECONDS.time(kind='new'):
+            return templates['new'].render(self._task_values(templates, snapshot))
+
+    def render_change(self, old, new, locale=None):
+        """Renders the changed fields between two snapshots, or returns None when nothing tracked changed."""
+        started = time.perf_counter()
+        locale = self.locale_for(locale)
+        templates = self._templates[locale]
+        labels = self._labels[locale]
+        line = templates['change_line']
+        changes = [line.render({'label': labels.get(field, field), 'old': old_value, 'new': new_value})
+                   for field, old_value, new_value in new.changes_from(old)]
+        if not changes:
+            return None # Only the url or edit time changed
+        values = new.to_dict()
+        values['changes'] = "\n".join(changes)
+        message = templates['changed'].render(values)
+        RENDER_SECONDS.observe(time.perf_counter() - started, kind='changed')
+        return message
 
-    def _get_property_value_safe(self, properties, prop_name, prop_type):
-        """Helper to safely get property value, similar to format_task_message but for internal use."""
-        prop_data = properties.get(prop_name)
-        if not prop_data:
-            return "N/A"
-
-        if prop_type == 'title':
-            title_array = prop_data.get('title', [])
-            return title_array[0].get('text', {}).get('content', 'N/A') if title_array else "N/A"
-        elif prop_type == 'rich_text':
-            rich_text_array = prop_data.get('rich_text', [])
-            return rich_text_array[0].get('text', {}).get('content', 'N/A') if rich_text_array else "N/A"
-        elif prop_type == 'date':
-            date_info = prop_data.get('date')
-            return date_info.get('start', 'N/A') if date_info else "N/A"
-        elif prop_type == 'select':
-            select_info = prop_data.get('select')
-            return select_info.get('name', 'N/A') if select_info else "N/A"
-        elif prop_type == 'status':
-            status_info = prop_data.get('status')
-            return status_info.get('name', 'N/A') if status_info else "N/A"
-        elif prop_type == 'people':
-            people_array = prop_data.get('people', [])
-            return ", ".join([p.get('name', 'N/A') for p in people_array]) if people_array else "N/A"
-        elif prop_type == 'number':
-            return str(prop_data.get('number', 'N/A'))
+    def render_deleted(self, snapshot, locale=None):
+        return self.render('deleted', snapshot.to_dict(), locale)
+
+
+def _markdown_cut(text, limit):
+    """Returns (cut, reopen) for splitting MarkdownV2 text at or before `limit` without breaking an escape or entity.
+
+    A cut where no entity is open is preferred: at a line break, then at whitespace, then anywhere.
+    When every position is inside an entity, the cut falls inside it and `reopen` holds the markers
+    that close it at the end of the chunk (reversed) and reopen it at the start of the next one.
+    (0, '') means no usable cut was found, e.g. inside a link.
+    """
+    marks = [] # Open emphasis markers, in opening order
+    in_code = in_link = False
+    line = space = anywhere = 0
+    fallback = (0, '')
+    i = 0
+    while i < limit:
+        char = text[i]
+        if char == '\\':
+            i += 2 # An escape and the character it protects stay together
+        else:
+            if in_code:
+                in_code = char != '`'
+            elif char == '`':
+                in_code = True
+            elif char in '*_~|':
+                # Underline (__) and spoiler (||) markers are two characters long
+                mark = text[i:i + 2] if text[i:i + 2] in ('__', '||') else char
+                if mark in marks:
+                    marks.remove(mark)
+                else:
+                    marks.append(mark)
+                i += len(mark) - 1
+            elif char == '[':
+                in_link = True
+            elif char == ')' and in_link:
+                in_link = False
+            i += 1
+        if i > limit or in_link:
+            continue
+        if not in_code and not marks:
+            anywhere = i
+            if char == '\n':
+                line = i - 1 # Cut before the line break
+            elif char.isspace():
+                space = i
         else:
-            return "N/A"
+            reopen = ''.join(marks) + ('`' if in_code else '')
+            if i + len(reopen) <= limit:
+                fallback = (i, reopen)
+    cut = line or space or anywhere
+    return (cut, '') if cut > 0 else fallback
+
+
+def split_message(text, limit=TELEGRAM_MAX_MESSAGE_LENGTH):
+    """Splits MarkdownV2 text into chunks of at most `limit` characters, cutting at line breaks where possible.
+
+    Every chunk stays valid MarkdownV2 on its own: no escape is split, and a code span or emphasis
+    that has to be cut is closed at the end of one chunk and reopened in the next.
+    """
+    chunks = []
+    while len(text) > limit:
+        cut, reopen = _markdown_cut(text, limit)
+        if cut <= 0:
+            cut = limit
+            # Never leave a dangling backslash at the end of a chunk
+            if (cut - len(text[:cut].rstrip('\\'))) % 2:
+                cut -= 1
+        chunks.append(text[:cut] + reopen[::-1])
+        text = reopen + text[cut:] if reopen else text[cut:].lstrip('\n')
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+class DigestRenderer:
+    """Merges several outbox rows for one chat into as few Telegram messages as possible.
+
+    Events for the same page are collapsed into one net change (first "before", last "after"),
+    and the rendered notifications are packed into messages under Telegram's length limit.
+    """
+
+    SEPARATOR = "\n\n"
+
+    def __init__(self, message_renderer=None):
+        self.message_renderer = message_renderer or MessageRenderer()
+
+    @staticmethod
+    def coalesce(rows):
+        """Returns the rows as a list of plain texts (str) and merged event dicts, in first-seen order."""
+        items = []
+        events_by_page = {}
+        for row in rows:
+            if not row.event:
+                items.append(row.text)
+                continue
+            event = json.loads(row.event)
+            merged = events_by_page.get(event['page_id'])
+            if merged is None:
+                events_by_page[event['page_id']] = event
+                items.append(event)
+                continue
+            merged['new'] = event.get('new')
+            if event['kind'] == 'deleted':
+                # A page created and deleted within the window never needs to be mentioned
+                merged['kind'] = 'dropped' if merged['kind'] == 'new' else 'deleted'
+            elif merged['kind'] in ('deleted', 'dropped'):
+                merged['kind'] = 'changed' if merged.get('old') else 'new'
+        return items
+
+    def render_event(self, event):
+        """Renders a merged event in its database's locale, or returns None when it nets out to nothing."""
+        old = TaskSnapshot.from_row(event['old']) if event.get('old') else None
+        new = TaskSnapshot.from_row(event['new']) if event.get('new') else None
+        locale = event.get('locale')
+        if event['kind'] == 'new':
+            return self.message_renderer.render_new(new, locale)
+        if event['kind'] == 'changed':
+            return self.message_renderer.render_change(old, new, locale)
+        if event['kind'] == 'deleted':
+            return self.message_renderer.render_deleted(old, locale)
+        return None
+
+    def render(self, rows):
+        """Returns the list of message texts to send for the given rows."""
+        if len(rows) == 1:
+            return split_message(rows[0].text)
+
+        items = self.coalesce(rows)
+        texts = [item if isinstance(item, str) else self.render_event(item) for item in items]
+        texts = [text for text in texts if text]
+        if len(texts) <= 1:
+            return [chunk for text in texts for chunk in split_message(text)]
+
+        locale = next((item.get('locale') for item in items if not isinstance(item, str)), None)
+        header = self.message_renderer.render('digest_header', {'count': len(texts)}, locale)
+        messages = []
+        current = header
+        for text in texts:
+            candidate = current + (self.SEPARATOR if current != header else '') + text
+            if len(candidate) <= TELEGRAM_MAX_MESSAGE_LENGTH:
+                current = candidate
+                continue
+            if current != header:
+                messages.append(current)
+            if len(header) + len(text) <= TELEGRAM_MAX_MESSAGE_LENGTH:
+                current = header + text
+            else:
+                # A single oversized notification is split on its own
+                messages.extend(split_message(text))
+                current = header
+        if current != header:
+            messages.append(current)
+        return messages
+
+
+class NotificationDispatcher:
+    """Delivers messages from a MessageOutbox using bounded queues drained by a pool of sender threads.
+
+    Producers only write outbox rows, so change detection never waits on delivery. A pump thread
+    moves due rows onto the bounded worker queues; every message for a given chat goes to the same
+    worker, so per-chat ordering is preserved, and the pump blocks while that worker's queue is full,
+    leaving the remaining rows in the outbox. Failed sends stay in the outbox and are retried with exponential backoff, and the
+later messages of that chat wait until the failed one has gone out.
+
+    With a digest window, rows for a chat are held until the oldest one is `digest_window` seconds
+    old (or `digest_max_events` rows are waiting) and then sent together as one digest.
+    """
+
+    def __init__(self, send_func, outbox, workers=4, queue_size=1000, retry_base=30, retry_max=3600, poll_interval=5,
+                 digest_window=0, digest_max_events=50, message_renderer=None, is_active=None):
+        self.send_func = send_func
+        self.outbox = outbox
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.digest_window = digest_window
+        self.digest_max_events = max(digest_max_events, 1)
+        self.poll_interval = min(poll_interval, digest_window) if digest_window > 0 else poll_interval
+        self.renderer = DigestRenderer(message_renderer)
+        # With several workers sharing the outbox only the one holding the dispatcher lease sends
+        self.is_active = is_active or (lambda: True)
+        self._in_flight = set()
+        self._in_flight_lock = threading.Lock()
+        # Chats whose oldest unsent row failed: {chat_id: row id}. Later batches already queued for the
+        # chat are left in the outbox until that row goes out, so the chat's messages stay in order.
+        self._held_chats = {}
+        self._wake = threading.Event()
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(max(workers, 1))]
+        for index, worker_queue in enumerate(self._queues):
+            thread = threading.Thread(target=self._worker, args=(worker_queue,), name=f"telegram-sender-{index}")
+            thread.daemon = True
+            thread.start()
+
+        # Messages left over from a previous run are replayed as soon as the pump starts
+        replay_count = outbox.pending()
+        if replay_count:
+            print(f"📤 Mengirim ulang {replay_count} notifikasi yang tertunda dari outbox")
+        pump_thread = threading.Thread(target=self._pump, name="telegram-outbox-pump")
+        pump_thread.daemon = True
+        pump_thread.start()
+
+    def submit(self, messages):
+        """Durably queues OutgoingMessage tuples for delivery; `description` is only used for logging."""
+        if messages:
+            self.outbox.add_many(messages)
+            self.wake()
+
+    def wake(self):
+        """Asks the pump to look for due messages right away."""
+        self._wake.set()
+
+    def pending(self):
+        """Returns the number of messages waiting to be sent."""
+        return self.outbox.pending()
+
+    def queue_depth(self):
+        """Returns the number of batches handed to the sender threads but not yet picked up."""
+        return sum(worker_queue.qsize() for worker_queue in self._queues)
+
+    def _retry_delay(self, attempts):
+        return min(self.retry_max, self.retry_base * (2 ** (attempts - 1))) * random.uniform(0.5, 1.5)
+
+    def _batches(self, rows):
+        """Groups due rows into the jobs that should be sent now."""
+        if self.digest_window <= 0:
+            return [[row] for row in rows]
+        rows_by_chat = OrderedDict()
+        for row in rows:
+            rows_by_chat.setdefault(row.chat_id, []).append(row)
+        batches = []
+        now = time.time()
+        for chat_rows in rows_by_chat.values():
+            while len(chat_rows) >= self.digest_max_events:
+                batches.append(chat_rows[:self.digest_max_events])
+                chat_rows = chat_rows[self.digest_max_events:]
+            # Keep collecting until the oldest waiting row has sat out the whole window
+            if chat_rows and now - chat_rows[0].created_at >= self.digest_window:
+                batches.append(chat_rows)
+        return batches
+
+    def _pump(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                if not self.is_active():
+                    continue
+                with self._in_flight_lock:
+                    in_flight = set(self._in_flight)
+                for batch in self._batches(self.outbox.due(exclude_ids=in_flight)):
+                    with self._in_flight_lock:
+                        self._in_flight.update(row.id for row in batch)
+                    self._queues[hash(batch[0].chat_id) % len(self._queues)].put(batch)
+            except Exception as e:
+                print(f"Error membaca outbox notifikasi: {e}")
+
+    def _worker(self, worker_queue):
+        while True:
+            batch = worker_queue.get()
+            chat_id = batch[0].chat_id
+            description = batch[0].description if len(batch) == 1 else f"ringkasan {len(batch)} pembaruan ke chat {chat_id}"
+            try:
+                held_by = self._held_chats.get(chat_id)
+                if held_by is not None and batch[0].id > held_by:
+                    continue
+                if all(self.send_func(text, chat_id) for text in self.renderer.render(batch)):
+                    for row in batch:
+                        self.outbox.mark_sent(row.id)
+                    self._held_chats.pop(chat_id, None)
+                    if description:
+                        print(f"✅ Notifikasi {description} berhasil dikirim")
+                else:
+                    # Parts of a digest that did go out may be repeated on retry (at-least-once delivery)
+                    for row in batch:
+                        attempts = row.attempts + 1
+                        retry_delay = self._retry_delay(attempts)
+                        dead = self.outbox.mark_failed(row.id, attempts, retry_delay)
+                    if dead:
+                        # A parked message no longer holds back the rest of the chat
+                        self._held_chats.pop(chat_id, None)
+                        print(f"❌ Gagal mengirim notifikasi {description or ''} setelah {attempts} percobaan, pesan disimpan di outbox")
+                    else:
+                        self._held_chats[chat_id] = batch[0].id
+                        print(f"❌ Gagal mengirim notifikasi {description or ''}, dicoba lagi dalam {retry_delay:.0f} detik")
+            except Exception as e:
+                print(f"Error di pengirim notifikasi: {e}")
+            finally:
+                with self._in_flight_lock:
+                    self._in_flight.difference_update(row.id for row in batch)
+                worker_queue.task_done()
+
+
+class WebhookDeduplicator:
+    """Remembers the most recent webhook event ids, so redelivered events are processed once."""
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_duplicate(self, event_id):
+        """Records the event id and returns True if it was already seen."""
+        with self._lock:
+            if event_id in self._seen:
+                self._seen.move_to_end(event_id)
+                return True
+            self._seen[event_id] = None
+            if len(self._seen) > self.max_size:
+                self._seen.popitem(last=False)
+            return False
+
 
-    def get_tasks_for_offset(self, offset_days):
-        """Mengambil tugas yang tenggat waktunya sesuai offset hari dari Notion"""
-        target_date = datetime.now(self.timezone) + timedelta(days=offset_days)
-        formatted_target_date = target_date.strftime('%Y-%m-%d')
+def verify_notion_signature(secret, body, signature):
+    """Checks the X-Notion-Signature header (sha256=<hex HMAC of the raw body>) against the verification token."""
+    if not secret or not signature:
+        return False
+    expected = 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+class TtlLruCache:
+    """Thread-safe LRU cache whose entries also expire `ttl` seconds after they were stored.
+
+    get_or_load() lets concurrent callers asking for the same missing key share a single load.
+    """
+
+    def __init__(self, max_entries=2048, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key, loader):
+        """Returns the cached value for `key`, calling loader() once to fill it when missing or expired."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            ENRICHMENT_CACHE.inc(result='hit')
+            return value
+        with self._lock:
+            event = self._loading.get(key)
+            leader = event is None
+            if leader:
+                event = self._loading[key] = threading.Event()
+        if not leader:
+            event.wait()
+            value = self.get(key, missing)
+            if value is not missing:
+                ENRICHMENT_CACHE.inc(result='hit')
+                return value
+        ENRICHMENT_CACHE.inc(result='miss')
+        try:
+            value = loader()
+            self.set(key, value)
+            return value
+        finally:
+            if leader:
+                with self._lock:
+                    self._loading.pop(key, None)
+                event.set()
+
+
+class PageEnricher:
+    """Fetches extra context for reminders on demand: a page content excerpt, related page titles and user names.
+
+    Results are cached by id (and by last_edited_time for page content), so a task that is reminded
+    again, or a project shared by many tasks, costs no further API calls. Fetches run on a small
+    thread pool and go through the shared Notion client, whose rate limiter caps them.
+    """
+
+    # Maximum related pages looked up per relation property
+    MAX_RELATIONS = 5
+
+    def __init__(self, notion_client, api_url, parts=('excerpt', 'relations', 'people'), cache=None,
+                 max_workers=4, excerpt_length=200):
+        self.notion_client = notion_client
+        self.api_url = api_url
+        self.parts = set(parts)
+        self.cache = cache or TtlLruCache()
+        self.excerpt_length = excerpt_length
+        self._executor = ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix="notion-enrich")
+
+    def enrich(self, tasks):
+        """Returns one dict per task with the optional keys 'excerpt', 'related' ([(property, titles)]) and 'assignee'."""
+        return list(self._executor.map(self._enrich_task, tasks))
+
+    def _enrich_task(self, task):
+        enrichment = {}
+        try:
+            if 'excerpt' in self.parts:
+                excerpt = self.page_excerpt(task['id'], task.get('last_edited_time'))
+                if excerpt:
+                    enrichment['excerpt'] = excerpt
+            for name, prop in task['properties'].items():
+                prop_type = prop.get('type')
+                if prop_type == 'relation' and 'relations' in self.parts and prop.get('relation'):
+                    titles = [self.page_title(related['id']) for related in prop['relation'][:self.MAX_RELATIONS]]
+                    enrichment.setdefault('related', []).append((name, ", ".join(titles)))
+                elif prop_type == 'people' and 'people' in self.parts and prop.get('people'):
+                    # Some integrations only receive user ids inline
+                    if any(not person.get('name') for person in prop['people']):
+                        enrichment['assignee'] = ", ".join(
+                            person.get('name') or self.user_name(person['id']) for person in prop['people']
+                        )
+        except Exception as e:
+            # Enrichment is optional: any failure (HTTP error, unexpected payload) still lets the reminder go out
+            print(f"⚠️ Gagal mengambil detail tambahan untuk {task.get('id')}: {e}")
+            return {}
+        return enrichment
+
+    def page_excerpt(self, page_id, last_edited_time):
+        """Returns the beginning of the page's text content."""
+        def load():
+            response = self.notion_client.get(f"{self.api_url}/blocks/{page_id}/children", params={'page_size': 20})
+            text = ''
+            for block in response.json().get('results', []):
+                segments = block.get(block.get('type'), {}).get('rich_text') or []
+                line = ''.join(segment.get('plain_text', '') for segment in segments).strip()
+                if line:
+                    text = f"{text} {line}" if text else line
+                if len(text) >= self.excerpt_length:
+                    break
+            return text[:self.excerpt_length - 1] + '…' if len(text) > self.excerpt_length else text
+        return self.cache.get_or_load(('excerpt', page_id, last_edited_time), load)
+
+    def page_title(self, page_id):
+        """Returns the title of any page, e.g. the project a task is related to."""
+        def load():
+            page = self.notion_client.get(f"{self.api_url}/pages/{page_id}").json()
+            title = next((prop.get('title') for prop in page.get('properties', {}).values() if prop.get('type') == 'title'), None)
+            return ''.join(segment.get('plain_text', '') for segment in title or []) or 'Untitled'
+        return self.cache.get_or_load(('page_title', page_id), load)
+
+    def user_name(self, user_id):
+        def load():
+            return self.notion_client.get(f"{self.api_url}/users/{user_id}").json().get('name') or 'Unknown User'
+        return self.cache.get_or_load(('user', user_id), load)
+
+
+def normalize_database_id(database_id):
+    """Returns a Notion id without dashes and in lower case, so ids from URLs, configs and API responses compare equal."""
+    return (database_id or '').replace('-', '').lower()
+
+
+def parse_offset_days(value):
+    """Parses REMINDER_OFFSET_DAYS-style input (a comma-separated string or a list), defaulting to [0] for today."""
+    items = value.split(',') if isinstance(value, str) else value
+    offsets = [int(str(x).strip()) for x in items if str(x).strip().lstrip('-').isdigit()]
+    return offsets or [0] # Fallback if parsing fails
+
+
+def load_database_configs():
+    """Returns the list of watched databases.
+
+    With BOT_CONFIG pointing to a JSON file, each entry of its "databases" list looks like:
+        {"id": "...", "name": "Tim A", "chat_id": "...", "reminder_offset_days": [0, 1], "locale": "id",
+         "routes": [{"assignee": "Budi", "chat_id": "..."}, {"category": "Bug", "chat_id": "..."}]}
+    Without it, a single database is configured from NOTION_DATABASE_ID and TELEGRAM_CHAT_ID.
+    """
+    config_path = os.getenv('BOT_CONFIG')
+    if not config_path:
+        return [{
+            'id': os.getenv('NOTION_DATABASE_ID'),
+            'chat_id': os.getenv('TELEGRAM_CHAT_ID'),
+            'reminder_offset_days': os.getenv('REMINDER_OFFSET_DAYS', '0'),
+        }]
+    with open(config_path, 'r') as f:
+        databases = json.load(f).get('databases', [])
+    for database in databases:
+        database.setdefault('chat_id', os.getenv('TELEGRAM_CHAT_ID'))
+        database.setdefault('reminder_offset_days', os.getenv('REMINDER_OFFSET_DAYS', '0'))
+    return databases
+
+
+class BotResources:
+    """Connection pools, rate limiters, outbox and dispatcher shared by every watched database."""
+
+    def __init__(self, coordinator=None):
+        # Coordination with other workers; a standalone coordinator owns everything
+        self.coordinator = coordinator or WorkerCoordinator()
+        self.notion_token = os.getenv('NOTION_TOKEN')
+        self.telegram_bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
+        # API base URLs, overridable to point the bot at a local stand-in server (see tools/mock_api_server.py)
+        self.notion_api_url = os.getenv('NOTION_API_URL', 'https://api.notion.com/v1').rstrip('/')
+        self.telegram_api_url = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org').rstrip('/')
 
-        # Pertama, ambil struktur database untuk melihat properties yang tersedia
-        db_url = f"https://api.notion.com/v1/databases/{self.notion_database_id}"
+        # Headers untuk Notion API
+        self.notion_headers = {
+            'Authorization': f'Bearer {self.notion_token}',
+            'Content-Type': 'application/json',
+            'Notion-Version': '2022-06-28'
+        }
 
+        # Pooled HTTP clients with retries and per-API rate limits
+        http_timeout = float(os.getenv('HTTP_TIMEOUT', '30')) # In seconds
+        http_max_retries = int(os.getenv('HTTP_MAX_RETRIES', '5'))
+        self.notion_client = ApiClient(
+            'Notion', rate=float(os.getenv('NOTION_RATE_LIMIT', '3')), headers=self.notion_headers,
+            timeout=http_timeout, max_retries=http_max_retries,
+        )
+        self.telegram_client = ApiClient(
+            'Telegram', rate=float(os.getenv('TELEGRAM_RATE_LIMIT', '30')),
+            key_rate=float(os.getenv('TELEGRAM_CHAT_RATE_LIMIT', '1')),
+            timeout=http_timeout, max_retries=http_max_retries,
+        )
+
+        # Notification templates for every locale, compiled once
+        self.renderer = MessageRenderer(os.getenv('MESSAGE_LOCALE', 'id'))
+
+        # Optional reminder enrichment (ENRICHMENT=excerpt,relations,people), cached across databases
+        enrichment_parts = [part.strip() for part in os.getenv('ENRICHMENT', '').split(',') if part.strip()]
+        self.enricher = None
+        if enrichment_parts:
+            self.enricher = PageEnricher(
+                self.notion_client, self.notion_api_url, enrichment_parts,
+                cache=TtlLruCache(int(os.getenv('ENRICHMENT_CACHE_SIZE', '2048')), float(os.getenv('ENRICHMENT_CACHE_TTL', '3600'))),
+                max_workers=int(os.getenv('ENRICHMENT_CONCURRENCY', '4')),
+                excerpt_length=int(os.getenv('ENRICHMENT_EXCERPT_LENGTH', '200')),
+            )
+
+        # Outgoing messages are recorded in a durable outbox and sent in the background,
+        # so detection never waits on Telegram and failed sends are retried
+        self.outbox = MessageOutbox(
+            os.getenv('STATE_DB_PATH', 'notion_bot.db'),
+            max_attempts=int(os.getenv('OUTBOX_MAX_ATTEMPTS', '20')),
+        )
+        self.dispatcher = NotificationDispatcher(
+            self.send_telegram_message,
+            self.outbox,
+            workers=int(os.getenv('TELEGRAM_SENDER_WORKERS', '4')),
+            queue_size=int(os.getenv('NOTIFICATION_QUEUE_SIZE', '1000')),
+            retry_base=float(os.getenv('OUTBOX_RETRY_BASE', '30')),
+            retry_max=float(os.getenv('OUTBOX_RETRY_MAX', '3600')),
+            digest_window=float(os.getenv('DIGEST_WINDOW_SECONDS', '0')),
+            digest_max_events=int(os.getenv('DIGEST_MAX_EVENTS', '50')),
+            message_renderer=self.renderer,
+            is_active=lambda: self.coordinator.is_leader('dispatcher'),
+        )
+        # Webhook events for databases another worker owns are handed over through the shared database
+        self.webhook_inbox = WebhookInbox(self.outbox)
+        OUTBOX_PENDING.set_function(self.outbox.pending)
+        DISPATCH_QUEUE_DEPTH.set_function(self.dispatcher.queue_depth)
+
+    @timed(TELEGRAM_SEND_SECONDS)
+    def send_telegram_message(self, message, chat_id):
+        """Mengirim pesan ke Telegram"""
+        telegram_url = f"{self.telegram_api_url}/bot{self.telegram_bot_token}/sendMessage"
+        payload = {
+            "chat_id": chat_id,
+            "text": message,
+            "parse_mode": "MarkdownV2"
+        }
         try:
-            db_response = requests.get(db_url, headers=self.notion_headers)
-            db_response.raise_for_status()
-            db_data = db_response.json()
-
-            # Cari property bertipe date
-            date_property = None
-            # print("Available database properties:") # Debugging line, can be removed
-            for prop_name, prop_info in db_data['properties'].items():
-                prop_type = prop_info.get('type')
-                # print(f"  - {prop_name}: {prop_type}") # Debugging line, can be removed
-                if prop_type == 'date' and date_property is None:
-                    date_property = prop_name
-
-            if not date_property:
-                print("❌ Tidak ditemukan property bertipe 'date' di database ini")
-                return None
-
-            print(f"✅ Menggunakan property '{date_property}' sebagai due date")
-
-            # Query untuk mencari tugas dengan due date hari ini
-            query = {
-                "filter": {
-                    "property": date_property,
-                    "date": {
-                        "equals": formatted_target_date
-                    }
-                }
-            }
+            try:
+                self.telegram_client.post(telegram_url, json=payload, limit_key=chat_id)
+            except requests.exceptions.HTTPError as e:
+                # Messages queued by older versions use legacy Markdown; send them as plain text instead of losing them
+                if e.response is None or e.response.status_code != 400 or "can't parse entities" not in e.response.text:
+                    raise
+                print("⚠️ Telegram menolak format pesan, mengirim ulang sebagai teks biasa")
+                payload.pop("parse_mode")
+                self.telegram_client.post(telegram_url, json=payload, limit_key=chat_id)
+            return True
+        except requests.exceptions.RequestException as e:
+            TELEGRAM_SEND_FAILURES.inc()
+            print(f"Error mengirim pesan ke Telegram: {e}")
+            return False
+
 
+class NotionTelegramBot:
+    def __init__(self, database_config=None, resources=None):
+        database_config = database_config or load_database_configs()[0]
+        self.resources = resources or BotResources()
+        # Konfigurasi API Keys
+        self.notion_token = self.resources.notion_token
+        self.telegram_bot_token = self.resources.telegram_bot_token
+        self.telegram_chat_id = database_config.get('chat_id')
+        self.notion_database_id = database_config.get('id')
+        self.name = database_config.get('name') or self.notion_database_id
+        # Extra chats that receive notifications for matching assignees or categories
+        self.routes = database_config.get('routes', [])
+        # Locale of this database's notifications (see MESSAGE_TEMPLATES)
+        self.renderer = self.resources.renderer
+        self.enricher = self.resources.enricher
+        self.locale = self.renderer.locale_for(database_config.get('locale') or self.renderer.default_locale)
+        # Konfigurasi timezone, default ke UTC jika tidak diset
+        self.timezone = pytz.timezone(os.getenv('TIMEZONE', 'UTC'))
+        # Allow multiple reminder offsets, comma-separated. Default to [0] for today.
+        self.reminder_offset_days = parse_offset_days(database_config.get('reminder_offset_days', '0'))
+
+        # Configure weekly holidays (e.g., "Saturday,Sunday")
+        weekly_holidays_str = os.getenv('WEEKLY_HOLIDAYS', '')
+        self.weekly_holidays = [day.strip().lower() for day in weekly_holidays_str.split(',') if day.strip()]
+        self.send_on_holidays = os.getenv('SEND_ON_HOLIDAYS', 'False').lower() == 'true'
+
+        # Shared HTTP clients, outbox and dispatcher
+        self.notion_headers = self.resources.notion_headers
+        self.notion_client = self.resources.notion_client
+        self.telegram_client = self.resources.telegram_client
+        self.outbox = self.resources.outbox
+        self.dispatcher = self.resources.dispatcher
+
+        # Database schema cache, shared by every query and formatter
+        self.schema_cache_ttl = int(os.getenv('SCHEMA_CACHE_TTL', '3600')) # In seconds
+        self._schema_properties = None
+        self._schema_fetched_at = None
+        self._property_names = None
+        self._property_extractor = None
+
+        # State management for change detection
+        # The legacy single-database state (JSON file or unscoped rows) belongs to NOTION_DATABASE_ID
+        owns_legacy_state = self._is_own_database(os.getenv('NOTION_DATABASE_ID'))
+        self.state_file = os.getenv('STATE_FILE', 'notion_state.json')
+        if not owns_legacy_state:
+            root, extension = os.path.splitext(self.state_file)
+            self.state_file = f"{root}_{normalize_database_id(self.notion_database_id)}{extension}"
+        if os.getenv('STATE_BACKEND', 'sqlite').lower() == 'json':
+            self.state_store = JsonStateStore(self.state_file, self.outbox)
+        else:
+            self.state_store = SqliteStateStore(self.outbox, normalize_database_id(self.notion_database_id), claim_unscoped_rows=owns_legacy_state)
+            # One-time migration from the legacy JSON state file
+            if self.state_store.is_empty() and os.path.exists(self.state_file):
+                imported = self.state_store.import_json(self.state_file)
+                print(f"📥 {imported} tugas diimpor dari {self.state_file}")
+        # Reminders already sent, so frequent reminder runs do not repeat them. By default only interval
+        # schedules dedupe; SCHEDULE_TIME/SCHEDULE_CRON runs keep sending at every configured time.
+        self.reminder_ledger = None
+        reminder_dedup = os.getenv('REMINDER_DEDUP', '').lower()
+        if not reminder_dedup:
+            interval_only = not os.getenv('SCHEDULE_CRON') and not os.getenv('SCHEDULE_TIME') and int(os.getenv('SCHEDULE_INTERVAL_MINUTES') or 0) > 0
+            reminder_dedup = 'true' if interval_only else 'false'
+        if reminder_dedup == 'true':
+            self.reminder_ledger = ReminderLedger(self.outbox, normalize_database_id(self.notion_database_id))
+
+        # Determine if this is the initial run (no prior state loaded)
+        self.is_initial_run = self.state_store.is_empty()
+
+        # Serialises polling and webhook ingestion, which both read and write the state store
+        self._sync_lock = threading.RLock()
+
+        # Incremental sync: only pages edited since the high-water mark are queried between
+        # periodic full reconciliation passes, which are still needed to detect deletions.
+        self.full_sync_interval = int(os.getenv('FULL_SYNC_INTERVAL', '60')) # In minutes, 0 = always full sync
+        self.last_full_sync = None
+        self.sync_high_water_mark = self.state_store.high_water_mark()
+
+    def _get_simplified_task_state(self, task, extractor=None):
+        """Extracts key properties from a Notion task into a TaskSnapshot for state comparison."""
+        extractor = extractor or self.get_property_extractor()
+        return TaskSnapshot(task['last_edited_time'], task['url'], *extractor.values(task['properties']))
+
+    def _get_database_schema(self):
+        """Returns the database properties, fetching them only when the cached copy is older than SCHEMA_CACHE_TTL."""
+        now = time.monotonic()
+        if self._schema_properties is not None and now - self._schema_fetched_at < self.schema_cache_ttl:
+            return self._schema_properties
+
+        db_url = f"{self.resources.notion_api_url}/databases/{self.notion_database_id}"
+        db_response = self.notion_client.get(db_url)
+        self._schema_properties = db_response.json()['properties']
+        self._schema_fetched_at = now
+        self._property_names = self._resolve_property_names(self._schema_properties)
+        self._property_extractor = PropertyExtractor(self._property_names, self._schema_properties)
+        return self._schema_properties
+
+    def _resolve_property_names(self, schema_properties):
+        """Maps each tracked field to the database property it should be read from."""
+        names = {}
+        for field, (default_name, prop_type) in TASK_PROPERTIES.items():
+            prop_info = schema_properties.get(default_name)
+            if (prop_info and prop_info.get('type') == prop_type) or field not in SCHEMA_RESOLVED_FIELDS:
+                names[field] = default_name
+                continue
+            # Cari property pertama dengan tipe yang sesuai
+            names[field] = next((name for name, info in schema_properties.items() if info.get('type') == prop_type), None)
+        if names['due_date']:
+            print(f"✅ Menggunakan property '{names['due_date']}' sebagai due date")
+        return names
+
+    def get_property_names(self):
+        """Returns the resolved property name for every tracked field, falling back to the defaults if the schema is unavailable."""
+        try:
+            self._get_database_schema()
         except requests.exceptions.RequestException as e:
             print(f"Error fetching database structure: {e}")
-            # Fallback ke query sederhana tanpa filter khusus
-            query = {}
+            if self._property_names is None:
+                self._property_names = {field: default_name for field, (default_name, _) in TASK_PROPERTIES.items()}
+                self._property_extractor = PropertyExtractor(self._property_names)
+            # Serve the last known (or default) names for a short while instead of retrying on every task
+            if self._schema_properties is None:
+                self._schema_properties = {}
+            self._schema_fetched_at = time.monotonic() - max(self.schema_cache_ttl - SCHEMA_RETRY_DELAY, 0)
+        return self._property_names
+
+    def get_property_extractor(self):
+        """Returns the PropertyExtractor compiled for the current database schema."""
+        self.get_property_names()
+        return self._property_extractor
+
+    def invalidate_schema_cache(self):
+        """Forces the next schema lookup to hit the Notion API."""
+        self._schema_properties = None
+        self._schema_fetched_at = None
+
+    @staticmethod
+    def _is_property_not_found_error(error):
+        """Returns True if a Notion request failed because a filter referenced a property that no longer exists."""
+        response = getattr(error, 'response', None)
+        if response is None or response.status_code != 400:
+            return False
+        try:
+            message = response.json().get('message', '')
+        except ValueError:
+            return False
+        return 'Could not find property' in message
+
+    def _iter_schema_query(self, build_query):
+        """Streams a query built from the resolved property names, refreshing the schema once if a property went missing."""
+        yielded = False
+        try:
+            for page in self._iter_database_pages(build_query(self.get_property_names())):
+                yielded = True
+                yield page
+        except requests.exceptions.HTTPError as e:
+            if yielded or not self._is_property_not_found_error(e):
+                raise
+            print("⚠️ Struktur database berubah, memuat ulang schema...")
+            self.invalidate_schema_cache()
+            yield from self._iter_database_pages(build_query(self.get_property_names()))
+
+    def get_tasks_for_offsets(self, offsets):
+        """Mengambil tugas untuk semua offset hari dengan satu query rentang tanggal.
+
+        Returns a dict mapping each offset to its list of tasks, or None if the tasks could not be fetched.
+        """
+        names = self.get_property_names()
+        if not names['due_date']:
+            print("❌ Tidak ditemukan property bertipe 'date' di database ini")
+            return None
 
-        url = f"https://api.notion.com/v1/databases/{self.notion_database_id}/query"
+        # Indeks tanggal tenggat -> offset, so each page is bucketed with one dict lookup
+        today = datetime.now(self.timezone)
+        offsets_by_date = {}
+        for offset in offsets:
+            target_date = (today + timedelta(days=offset)).strftime('%Y-%m-%d')
+            offsets_by_date.setdefault(target_date, []).append(offset)
 
+        # Query untuk mencari tugas dengan due date di antara offset terkecil dan terbesar
+        def build_query(property_names):
+            return {
+                "filter": {
+                    "and": [
+                        {"property": property_names['due_date'], "date": {"on_or_after": min(offsets_by_date)}},
+                        {"property": property_names['due_date'], "date": {"on_or_before": max(offsets_by_date)}},
+                    ]
+                }
+            }
+
+        tasks_by_offset = {offset: [] for offset in offsets}
         try:
-            response = requests.post(url, headers=self.notion_headers, json=query)
-            response.raise_for_status()
-            return response.json()
+            for task in self._iter_schema_query(build_query):
+                # Date-time values carry a time part; only the calendar date matters for bucketing
+                due_date = self.get_property_extractor().get(task['properties'], 'due_date')[:10]
+                for offset in offsets_by_date.get(due_date, ()):
+                    tasks_by_offset[offset].append(task)
         except requests.exceptions.RequestException as e:
             print(f"Error fetching tasks from Notion: {e}")
             return None
+        return tasks_by_offset
+
+    def _iter_database_pages(self, query=None):
+        """Yields pages from a database query one at a time, following next_cursor until the result set is exhausted.
+
+        Raises requests.exceptions.RequestException if any batch fails, so callers can tell a partial stream apart from a complete one.
+        """
+        url = f"{self.resources.notion_api_url}/databases/{self.notion_database_id}/query"
+        body = dict(query or {})
+        body['page_size'] = 100 # Maximum page size allowed by the Notion API
+
+        while True:
+            with NOTION_QUERY_SECONDS.time():
+                response = self.notion_client.post(url, json=body)
+            data = response.json()
+            yield from data.get('results', [])
+            if not data.get('has_more') or not data.get('next_cursor'):
+                return
+            body['start_cursor'] = data['next_cursor']
 
     def get_all_tasks(self):
-        """Mengambil semua tugas dari Notion database."""
-        url = f"https://api.notion.com/v1/databases/{self.notion_database_id}/query"
+        """Mengambil semua tugas dari Notion database sebagai generator, halaman demi halaman."""
+        return self._iter_database_pages()
+
+    def get_tasks_edited_since(self, timestamp):
+        """Mengambil tugas yang diubah pada atau setelah timestamp (ISO 8601) sebagai generator."""
+        query = {
+            "filter": {
+                "timestamp": "last_edited_time",
+                "last_edited_time": {
+                    # Notion rounds last_edited_time to the minute, so re-read the boundary minute
+                    "on_or_after": timestamp
+                }
+            }
+        }
+        return self._iter_database_pages(query)
+
+    def reset_sync_position(self):
+        """Re-reads the high-water mark from the state store and makes the next change check a full reconciliation."""
+        with self._sync_lock:
+            self.last_full_sync = None
+            self.sync_high_water_mark = self.state_store.high_water_mark()
+
+    def _is_full_sync_due(self):
+        """Returns True when the next change check must scan the whole database."""
+        if not self.sync_high_water_mark or self.last_full_sync is None:
+            return True
+        if self.full_sync_interval <= 0:
+            return True
+        return time.monotonic() - self.last_full_sync >= self.full_sync_interval * 60
+
+    @timed(JOB_SECONDS, job='check_for_changes')
+    def check_for_changes(self):
+        """Checks for changes in Notion tasks and sends notifications for new/updated tasks.
+
+        Between full reconciliation passes only pages edited since the high-water mark are fetched.
+        """
+        with self._sync_lock:
+            self._check_for_changes()
+
+    def _check_for_changes(self):
+        full_sync = self._is_full_sync_due()
+        if full_sync:
+            print("🔄 Memeriksa perubahan di Notion (rekonsiliasi penuh)...")
+            tasks = self.get_all_tasks()
+        else:
+            print(f"🔄 Memeriksa perubahan di Notion sejak {self.sync_high_water_mark}...")
+            tasks = self.get_tasks_edited_since(self.sync_high_water_mark)
+
+        extractor = self.get_property_extractor()
+        # Snapshots stored by an older extraction are refreshed during a full sync without notifying
+        refresh = full_sync and self.state_store.snapshot_version() < SNAPSHOT_VERSION
+        seen_ids = set()
+        diff_seconds = 0
+        upserts = {}
+        deletes = []
+        pending_messages = []
+        high_water_mark = self.sync_high_water_mark
+        sync_complete = True
+
+        # Identify new and updated tasks while pages are still streaming in
         try:
-            response = requests.post(url, headers=self.notion_headers)
-            response.raise_for_status()
-            return response.json().get('results', [])
+            for task in tasks:
+                started = time.perf_counter()
+                current_task_state = self._get_simplified_task_state(task, extractor)
+                seen_ids.add(task['id'])
+                if not high_water_mark or current_task_state.last_edited_time > high_water_mark:
+                    high_water_mark = current_task_state.last_edited_time
+                self._diff_task(task['id'], current_task_state, upserts, pending_messages, silent=refresh)
+                diff_seconds += time.perf_counter() - started
         except requests.exceptions.RequestException as e:
-            print(f"Error fetching all tasks from Notion: {e}")
-            return []
+            print(f"Error fetching tasks from Notion: {e}")
+            sync_complete = False
 
-    def check_for_changes(self):
-        """Checks for changes in Notion tasks and sends notifications for new/updated tasks."""
-        print("🔄 Memeriksa perubahan di Notion...")
-        current_tasks_raw = self.get_all_tasks()
-        if not current_tasks_raw:
+        if full_sync and not seen_ids and (not sync_complete or not self.state_store.is_empty()):
+            # An empty result for a non-empty state is more likely an API hiccup than a wiped database
             print("Tidak ada tugas yang ditemukan atau gagal mengambil tugas dari Notion.")
             return
 
-        current_tasks_processed = {task['id']: self._get_simplified_task_state(task) for task in current_tasks_raw}
+        if full_sync and sync_complete:
+            # Identify deleted tasks; only safe once every page has been seen
+            for task_id in self.state_store.page_ids():
+                if task_id not in seen_ids:
+                    self._diff_deleted_task(task_id, deletes, pending_messages)
+            self.last_full_sync = time.monotonic()
+        elif full_sync:
+            # Partial sync: pages we did not get to see keep their previous state
+            print("⚠️ Sinkronisasi tidak lengkap, deteksi tugas dihapus dilewati.")
+
+        POLL_PAGES.observe(len(seen_ids), mode='full' if full_sync else 'incremental')
+        DIFF_SECONDS.observe(diff_seconds)
+
+        # Advancing the high-water mark past a failed batch would skip its pages forever
+        if sync_complete:
+            self.sync_high_water_mark = high_water_mark
+
+        self._commit_changes(upserts, deletes, pending_messages)
+        if refresh and sync_complete:
+            self.state_store.set_snapshot_version(SNAPSHOT_VERSION)
+            print(f"✅ Snapshot tugas diperbarui ke versi {SNAPSHOT_VERSION}.")
+        print("✅ Pemeriksaan perubahan selesai.")
 
-        new_state_to_save = {}
+    def _diff_task(self, task_id, current_task_state, upserts, pending_messages, silent=False):
+        """Compares a task snapshot with the stored one, collecting the changed row and its notification.
+
+        With `silent`, changed rows are collected without a notification.
+        """
+        # Unchanged tasks are rejected with a single digest comparison
+        old_digest = self.state_store.get_digest(task_id)
+        if old_digest is None:
+            # New task
+            upserts[task_id] = current_task_state
+            print(f"🆕 Tugas baru terdeteksi: {current_task_state.title}")
+            message = self._format_new_task_message(current_task_state)
+            if message:
+                event = {'kind': 'new', 'page_id': task_id, 'old': None, 'new': current_task_state.to_row(), 'locale': self.locale}
+                for chat_id in self._chats_for(current_task_state):
+                    pending_messages.append(OutgoingMessage(chat_id, message, f"tugas baru untuk: {current_task_state.title}", event))
+        elif current_task_state.digest != old_digest:
+            # Existing task with updates
+            upserts[task_id] = current_task_state
+            if silent:
+                return
+            print(f"✏️ Perubahan terdeteksi untuk tugas: {current_task_state.title}")
+            old_task_state = self.state_store.get(task_id)
+            message = self._format_change_message(old_task_state, current_task_state)
+            if message:
+                event = {'kind': 'changed', 'page_id': task_id, 'old': old_task_state.to_row(), 'new': current_task_state.to_row(), 'locale': self.locale}
+                for chat_id in self._chats_for(current_task_state):
+                    pending_messages.append(OutgoingMessage(chat_id, message, f"perubahan untuk: {current_task_state.title}", event))
+
+    def _diff_deleted_task(self, task_id, deletes, pending_messages):
+        """Collects the removal of a stored task and its notification."""
+        deleted_task = self.state_store.get(task_id)
+        if deleted_task is None:
+            return
+        deletes.append(task_id)
+        deleted_task_title = deleted_task.title
+        print(f"🗑️ Tugas dihapus terdeteksi: {deleted_task_title}")
+        message = self._format_deleted_task_message(deleted_task)
+        event = {'kind': 'deleted', 'page_id': task_id, 'old': deleted_task.to_row(), 'new': None, 'locale': self.locale}
+        for chat_id in self._chats_for(deleted_task):
+            pending_messages.append(OutgoingMessage(chat_id, message, f"tugas dihapus untuk: {deleted_task_title}", event))
+
+    def _commit_changes(self, upserts, deletes, pending_messages):
+        """Saves only the changed rows, together with the (chat_id, text, description) notifications they produced."""
+        if upserts or deletes:
+            with STATE_SAVE_SECONDS.time():
+                self.state_store.commit(upserts, deletes, pending_messages)
+            self.dispatcher.wake()
+
+    def get_page(self, page_id):
+        """Mengambil satu halaman Notion berdasarkan id."""
+        response = self.notion_client.get(f"{self.resources.notion_api_url}/pages/{page_id}")
+        return response.json()
+
+    def _is_own_database(self, database_id):
+        return bool(database_id) and normalize_database_id(database_id) == normalize_database_id(self.notion_database_id)
+
+    def _chats_for(self, task_state):
+        """Returns the chats that should hear about a task: the database chat plus every matching route."""
+        chats = [self.telegram_chat_id]
+        assignees = {name.strip() for name in task_state.assignee.split(',')}
+        for route in self.routes:
+            if 'assignee' in route and route['assignee'] not in assignees:
+                continue
+            if 'category' in route and route['category'] != task_state.category:
+                continue
+            if route.get('chat_id') and route['chat_id'] not in chats:
+                chats.append(route['chat_id'])
+        return chats
+
+    def ingest_page_event(self, event):
+        """Applies a Notion webhook page event through the same diff and notification path as check_for_changes.
+
+        Only the affected page is fetched; the high-water mark is left alone so the safety
+        reconciliation still picks up anything a missed event would have carried.
+        """
+        event_type = event.get('type', '')
+        entity = event.get('entity') or {}
+        page_id = entity.get('id')
+        if entity.get('type') != 'page' or not page_id:
+            return
 
-        # Identify new and updated tasks
-        for task_id, current_task_state in current_tasks_processed.items():
-            new_state_to_save[task_id] = current_task_state # Prepare for saving
+        # Skip events from other databases without spending an API call on them
+        parent = (event.get('data') or {}).get('parent') or {}
+        if parent.get('type') == 'database' and not self._is_own_database(parent.get('id')):
+            return
 
-            if task_id not in self.last_known_state:
-                # New task
-                print(f"🆕 Tugas baru terdeteksi: {current_task_state.get('title', 'Untitled Task')}")
-                message = self._format_new_task_message(current_task_state)
-                if message:
-                    success = self.send_telegram_message(message)
-                    if success:
-                        print(f"✅ Notifikasi tugas baru berhasil dikirim untuk: {current_task_state.get('title', 'Untitled Task')}")
-                    else:
-                        print(f"❌ Gagal mengirim notifikasi tugas baru")
+        with self._sync_lock:
+            upserts = {}
+            deletes = []
+            pending_messages = []
+            if event_type == 'page.deleted':
+                self._diff_deleted_task(page_id, deletes, pending_messages)
             else:
-                # Existing task, check for updates
-                old_task_state = self.last_known_state[task_id]
-                if current_task_state != old_task_state:
-                    print(f"✏️ Perubahan terdeteksi untuk tugas: {current_task_state.get('title', 'Untitled Task')}")
-                    message = self._format_change_message(old_task_state, current_task_state)
-                    if message:
-                        success = self.send_telegram_message(message)
-                        if success:
-                            print(f"✅ Notifikasi perubahan berhasil dikirim untuk: {current_task_state.get('title', 'Untitled Task')}")
-                        else:
-                            print(f"❌ Gagal mengirim notifikasi perubahan")
-
-        # Identify deleted tasks
-        for task_id in self.last_known_state:
-            if task_id not in current_tasks_processed:
-                deleted_task_title = self.last_known_state[task_id].get('title', 'Untitled Task')
-                print(f"🗑️ Tugas dihapus terdeteksi: {deleted_task_title}")
-                message = f"🗑️ *Tugas Dihapus di Notion*\n\n" \
-                          f"📋 *Tugas:* {deleted_task_title}\n" \
-                          f"Tugas ini telah dihapus dari database Notion."
-                success = self.send_telegram_message(message)
-                if success:
-                    print(f"✅ Notifikasi tugas dihapus berhasil dikirim untuk: {deleted_task_title}")
-                else:
-                    print(f"❌ Gagal mengirim notifikasi tugas dihapus")
-
-        # Update the last known state and save it
-        self.last_known_state = new_state_to_save
-        self._save_state()
-        print("✅ Pemeriksaan perubahan selesai.")
-
-    def format_task_message(self, task):
-        """Format pesan tugas untuk Telegram dengan detail yang lebih baik"""
-        try:
-            properties = task['properties']
-
-            # Helper function to get property value safely
-            def get_property_value(prop_name, prop_type):
-                prop_data = properties.get(prop_name)
-                if not prop_data:
-                    return "N/A"
-
-                if prop_type == 'title':
-                    title_array = prop_data.get('title', [])
-                    return title_array[0].get('text', {}).get('content', 'N/A') if title_array else "N/A"
-                elif prop_type == 'rich_text':
-                    rich_text_array = prop_data.get('rich_text', [])
-                    return rich_text_array[0].get('text', {}).get('content', 'N/A') if rich_text_array else "N/A"
-                elif prop_type == 'date':
-                    date_info = prop_data.get('date')
-                    return date_info.get('start', 'N/A') if date_info else "N/A"
-                elif prop_type == 'select':
-                    select_info = prop_data.get('select')
-                    return select_info.get('name', 'N/A') if select_info else "N/A"
-                elif prop_type == 'status':
-                    status_info = prop_data.get('status')
-                    return status_info.get('name', 'N/A') if status_info else "N/A"
-                elif prop_type == 'people':
-                    people_array = prop_data.get('people', [])
-                    return ", ".join([p.get('name', 'N/A') for p in people_array]) if people_array else "N/A"
-                elif prop_type == 'number':
-                    return str(prop_data.get('number', 'N/A'))
-                else:
-                    return "N/A"
-
-            # Helper function to get user name from 'created_by' or 'last_edited_by' objects
-            def get_user_name(user_obj):
-                if user_obj:
-                    obj_type = user_obj.get('object')
-                    if obj_type == 'person':
-                        return user_obj.get('name', 'Unknown Person')
-                    elif obj_type == 'bot':
-                        # For bots, the name might be directly under the user_obj
-                        # or in a nested 'bot' object. Try direct name first.
-                        return user_obj.get('name', user_obj.get('bot', {}).get('owner', {}).get('user', {}).get('name', 'Unknown Bot'))
-                return 'Unknown User'
-
-            task_title = get_property_value("Task Name", "title")
-            task_url = task['url']
-            category = get_property_value("Category", "select")
-            assignee = get_property_value("Assignee", "people")
-            due_date = get_property_value("Due Date", "date")
-            status = get_property_value("Status", "status")
-            priority = get_property_value("Priority", "select")
-            description = get_property_value("Description", "rich_text")
-            progress = get_property_value("Progress", "number")
-
-            created_by_name = get_user_name(task.get('created_by'))
-            last_edited_by_name = get_user_name(task.get('last_edited_by'))
-
-            # Format pesan
-            message_header = "🔔 *Pengingat Tugas Notion*"
-
-            message = f"{message_header}\n\n"
-            message += f"📋 *Tugas:* {task_title}\n"
-            message += f"🔗 *Link:* [Buka di Notion]({task_url})\n"
-            message += f"--- Detail Tugas ---\n"
-            message += f"🗓️ *Tenggat:* {due_date}\n"
-            message += f"🏷️ *Kategori:* {category}\n"
-            message += f"👤 *Ditugaskan Kepada:* {assignee}\n"
-            message += f"📊 *Status:* {status}\n"
-            message += f"❗ *Prioritas:* {priority}\n"
-            message += f"📈 *Progress:* {progress}%\n"
-            if description != "N/A":
-                message += f"📝 *Deskripsi:* {description}\n"
-
-            # Determine the reminder message based on the offset
-            if hasattr(self, 'current_offset_days'):
-                if self.current_offset_days == 0:
-                    message += f"\n⏰ Jangan lupa untuk menyelesaikan tugas ini hari ini!"
-                elif self.current_offset_days < 0:
-                    message += f"\n⏰ Pengingat: Tugas ini jatuh tempo dalam {abs(self.current_offset_days)} hari!"
+                try:
+                    page = self.get_page(page_id)
+                except requests.exceptions.RequestException as e:
+                    print(f"Error fetching page {page_id} from Notion: {e}")
+                    return
+                if not self._is_own_database((page.get('parent') or {}).get('database_id')):
+                    return
+                if page.get('archived') or page.get('in_trash'):
+                    self._diff_deleted_task(page['id'], deletes, pending_messages)
                 else:
-                    message += f"\n⏰ Pengingat: Tugas ini sudah lewat {self.current_offset_days} hari!"
-            else: # Fallback if offset not set
-                message += f"\n⏰ Pengingat tugas!"
-
-            return message
-        except Exception as e:
-            print(f"Error formatting task message: {e}")
-            print(f"Task structure: {json.dumps(task, indent=2, default=str)}")
-            return None
+                    self._diff_task(page['id'], self._get_simplified_task_state(page), upserts, pending_messages)
+            self._commit_changes(upserts, deletes, pending_messages)
 
     def _format_new_task_message(self, new_task_state):
         """Formats a message for a newly added task."""
-        task_url = new_task_state.get('url', '#')
-        message_header = "✨ *Tugas Baru Ditambahkan di Notion*"
-        message = f"{message_header}\n\n"
-        message += f"📋 *Tugas:* {new_task_state.get('title', 'N/A')}\n"
-        message += f"🔗 *Link:* [Buka di Notion]({task_url})\n"
-        message += f"--- Detail Tugas ---\n"
-        message += f"🗓️ *Tenggat:* {new_task_state.get('due_date', 'N/A')}\n"
-        message += f"🏷️ *Kategori:* {new_task_state.get('category', 'N/A')}\n"
-        message += f"👤 *Ditugaskan Kepada:* {new_task_state.get('assignee', 'N/A')}\n"
-        message += f"📊 *Status:* {new_task_state.get('status', 'N/A')}\n"
-        message += f"❗ *Prioritas:* {new_task_state.get('priority', 'N/A')}\n"
-        message += f"📈 *Progress:* {new_task_state.get('progress', 'N/A')}%\n"
-        if new_task_state.get('description', 'N/A') != "N/A":
-            message += f"📝 *Deskripsi:* {new_task_state.get('description', 'N/A')}\n"
-        return message
+        return self.renderer.render_new(new_task_state, self.locale)
 
     def _format_change_message(self, old_task_state, new_task_state):
-        """Formats a message detailing changes between old and new task states."""
-        changes = []
-        for key, old_value in old_task_state.items():
-            if key in ['last_edited_time', 'url']: # Skip these for change reporting
-                continue
-            new_value = new_task_state.get(key)
-            if old_value != new_value:
-                changes.append(f"- *{key.replace('_', ' ').title()}:* `{old_value}` ➡️ `{new_value}`")
-
-        if not changes:
-            return None # No significant changes to report (only last_edited_time or url changed, but content is same)
-
-        task_url = new_task_state.get('url', '#')
-        message_header = "✏️ *Perubahan Tugas di Notion*"
-        message = f"{message_header}\n\n"
-        message += f"📋 *Tugas:* {new_task_state.get('title', 'N/A')}\n"
-        message += f"🔗 *Link:* [Buka di Notion]({task_url})\n"
-        message += f"--- Detail Perubahan ---\n"
-        message += "\n".join(changes)
-        return message
-
+        """Formats a message detailing changes between old and new task snapshots."""
+        return self.renderer.render_change(old_task_state, new_task_state, self.locale)
 
-    def get_task_title(self, task):
-        """Helper untuk mendapatkan judul tugas dari objek tugas Notion."""
-        for prop_name, prop_data in task['properties'].items():
-            if prop_data.get('type') == 'title':
-                title_array = prop_data.get('title', [])
-                return title_array[0].get('text', {}).get('content', 'Untitled Task') if title_array else "Untitled Task"
-        return "Untitled Task"
+    def _format_deleted_task_message(self, deleted_task_state):
+        """Formats a message for a task removed from the database."""
+        return self.renderer.render_deleted(deleted_task_state, self.locale)
 
+    @timed(JOB_SECONDS, job='run_reminder')
     def run_reminder(self):
         """Menjalankan pengingat tugas"""
         print("🚀 Memulai pengecekan tugas...")
 
+        sent = self.reminder_ledger.sent() if self.reminder_ledger else set()
+
         # Check if today is a weekly holiday, unless SEND_ON_HOLIDAYS is true
-        today_name = datetime.now(self.timezone).strftime('%A').lower()
+        today = datetime.now(self.timezone)
+        today_name = today.strftime('%A').lower()
         if not self.send_on_holidays and today_name in self.weekly_holidays:
             print(f"🎉 Hari ini adalah hari libur mingguan ({today_name.capitalize()}). Tidak ada pengingat yang akan dikirim.")
-            self.send_telegram_message(f"🎉 Hari ini adalah hari libur mingguan ({today_name.capitalize()}). Tidak ada pengingat yang akan dikirim.")
+            # The holiday notice is sent once per day, like a reminder without a page
+            holiday_key = ('', 0, today.strftime('%Y-%m-%d'))
+            if holiday_key not in sent:
+                message = self.renderer.render('holiday', {'day': today_name.capitalize()}, self.locale)
+                self._queue_reminders([holiday_key], [(self.telegram_chat_id, message, None)])
             return # Exit the function if it's a holiday and not configured to send on holidays
 
+        tasks_by_offset = self.get_tasks_for_offsets(self.reminder_offset_days)
+        if tasks_by_offset is None:
+            print("❌ Gagal mengambil data dari Notion")
+            return
+
+        pending_messages = []
+        reminder_keys = []
+        skipped = 0
+
         # Iterate through each reminder offset
         for offset in self.reminder_offset_days:
-            self.current_offset_days = offset # Store current offset for message formatting
             print(f"\n--- Memeriksa tugas dengan offset: {offset} hari ---")
 
-            tasks_data = self.get_tasks_for_offset(offset)
-
-            if not tasks_data:
-                print("❌ Gagal mengambil data dari Notion")
-                continue # Continue to the next offset if data fetching fails
-
-            tasks = tasks_data.get('results', [])
+            tasks = tasks_by_offset[offset]
 
             if not tasks:
                 if offset == 0:
                     print("✅ Tidak ada tugas yang jatuh tempo hari ini")
-                    print("✅ Tidak ada tugas yang jatuh tempo hari ini")
                 elif offset < 0:
                     print(f"✅ Tidak ada tugas yang jatuh tempo dalam {abs(offset)} hari.")
                 else:
@@ -417,77 +2121,730 @@ class NotionTelegramBot:
             else:
                 print(f"📋 Ditemukan {len(tasks)} tugas yang sudah lewat {offset} hari")
 
-            # Kirim notifikasi untuk setiap tugas
+            # Kirim notifikasi untuk setiap tugas yang belum diingatkan
+            extractor = self.get_property_extractor()
+            snapshots = []
+            due_tasks = []
             for task in tasks:
-                message = self.format_task_message(task)
-                if message:
-                    success = self.send_telegram_message(message)
-                    if success:
-                        # Assuming 'Task Name' is the title property. Adjust if your Notion database uses a different name.
-                        task_title = self.get_task_title(task)
-                        print(f"✅ Notifikasi berhasil dikirim untuk: {task_title}")
-                    else:
-                        print(f"❌ Gagal mengirim notifikasi untuk tugas")
-
-    def send_telegram_message(self, message):
+                snapshot = self._get_simplified_task_state(task, extractor)
+                key = (task['id'], offset, snapshot.due_date[:10])
+                if key in sent:
+                    skipped += 1
+                    continue
+                snapshots.append(snapshot)
+                due_tasks.append(task)
+                reminder_keys.append(key)
+            # Extra context is only fetched for reminders that are actually sent
+            enrichments = self.enricher.enrich(due_tasks) if self.enricher else None
+            if enrichments:
+                snapshots = [self._with_resolved_assignee(snapshot, enrichment) for snapshot, enrichment in zip(snapshots, enrichments)]
+            messages = self.renderer.render_reminders(snapshots, offset, self.locale, enrichments)
+            for snapshot, message in zip(snapshots, messages):
+                for chat_id in self._chats_for(snapshot):
+                    pending_messages.append((chat_id, message, f"untuk: {snapshot.title}"))
+
+        if skipped:
+            print(f"⏭️ {skipped} pengingat sudah dikirim sebelumnya dan dilewati")
+        self._queue_reminders(reminder_keys, pending_messages)
+
+    @staticmethod
+    def _with_resolved_assignee(snapshot, enrichment):
+        """Returns the snapshot with assignee names looked up by the enricher, if any were missing."""
+        if 'assignee' not in enrichment:
+            return snapshot
+        row = snapshot.to_row()
+        row[2 + TaskSnapshot.FIELDS.index('assignee')] = enrichment['assignee']
+        return TaskSnapshot.from_row(row)
+
+    def _queue_reminders(self, keys, messages):
+        """Queues reminder messages, recording their keys in the ledger in the same transaction."""
+        if self.reminder_ledger is None:
+            self.notify_many(messages)
+        elif keys:
+            self.reminder_ledger.record(keys, messages)
+            self.dispatcher.wake()
+
+    def notify_many(self, messages):
+        """Mengantrekan beberapa pesan (chat_id, message, description) sekaligus dalam satu transaksi outbox"""
+        self.dispatcher.submit(messages)
+
+    def send_telegram_message(self, message, chat_id=None):
         """Mengirim pesan ke Telegram"""
-        telegram_url = f"https://api.telegram.org/bot{self.telegram_bot_token}/sendMessage"
-        payload = {
-            "chat_id": self.telegram_chat_id,
-            "text": message,
-            "parse_mode": "Markdown"
-        }
+        return self.resources.send_telegram_message(message, chat_id or self.telegram_chat_id)
+
+class CronSchedule:
+    """Five-field cron expression (minute hour day-of-month month day-of-week) evaluated in a timezone.
+
+    Supports `*`, lists, ranges and steps, e.g. `*/15 8-17 * * 1-5`. Day of week 0 and 7 are Sunday.
+    As in cron, when both day fields are restricted a day matching either of them is due.
+    """
+
+    FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression, timezone):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression '{expression}' must have 5 fields")
+        self.expression = expression
+        self.timezone = timezone
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse_field(field, low, high) for field, (low, high) in zip(fields, self.FIELD_RANGES)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        self._days_restricted = not fields[2].startswith('*')
+        self._weekdays_restricted = not fields[4].startswith('*')
+
+    @classmethod
+    def daily(cls, hh_mm, timezone):
+        """Builds the schedule for a SCHEDULE_TIME entry such as "08:30" or "08:30:00".
+
+        Schedules have minute resolution, so a seconds part is accepted but not used.
+        """
+        parts = hh_mm.split(':')
+        if len(parts) not in (2, 3) or not all(part.isdigit() for part in parts):
+            raise ValueError(f"SCHEDULE_TIME '{hh_mm}' harus berformat HH:MM atau HH:MM:SS")
+        hour, minute = int(parts[0]), int(parts[1])
+        if hour > 23 or minute > 59 or (len(parts) == 3 and int(parts[2]) > 59):
+            raise ValueError(f"SCHEDULE_TIME '{hh_mm}' bukan jam yang valid")
+        return cls(f"{minute} {hour} * * *", timezone)
+
+    @staticmethod
+    def _parse_field(field, low, high):
+        values = set()
+        for part in field.split(','):
+            value_range, _, step = part.partition('/')
+            if value_range == '*':
+                start, end = low, high
+            elif '-' in value_range:
+                start, end = (int(value) for value in value_range.split('-', 1))
+            else:
+                start = int(value_range)
+                end = high if step else start # "5/10" runs from 5 every 10
+            step = int(step) if step else 1
+            if not low <= start <= end <= high or step < 1:
+                raise ValueError(f"Cron field '{field}' is outside {low}-{high}")
+            values.update(range(start, end + 1, step))
+        return sorted(values)
+
+    def _day_matches(self, day):
+        if day.month not in self.months:
+            return False
+        in_days = day.day in self.days
+        in_weekdays = day.isoweekday() % 7 in self.weekdays
+        if self._days_restricted and self._weekdays_restricted:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+
+    def next_after(self, moment):
+        """Returns the first due time strictly after the aware datetime `moment`."""
+        local = moment.astimezone(self.timezone).replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        day = local.date()
+        for _ in range(366 * 5):
+            if self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = datetime(day.year, day.month, day.day, hour, minute)
+                        if candidate >= local:
+                            return self.timezone.normalize(self.timezone.localize(candidate))
+            day += timedelta(days=1)
+        raise ValueError(f"Cron expression '{self.expression}' never matches")
+
+    def __str__(self):
+        return f"cron '{self.expression}' ({self.timezone.zone})"
+
+
+class IntervalSchedule:
+    """Runs every `minutes` minutes, on slots counted from the Unix epoch so every worker agrees on the due times."""
+
+    EPOCH = datetime(1970, 1, 1, tzinfo=pytz.utc)
+
+    def __init__(self, minutes):
+        self.interval = timedelta(minutes=minutes)
+        if self.interval <= timedelta(0):
+            raise ValueError("Interval must be positive")
+
+    def next_after(self, moment):
+        """Returns the first slot strictly after the aware datetime `moment`, in the timezone of `moment`."""
+        # Whole microseconds keep the slot (and the run claim keyed by it) identical on every worker
+        step = self.interval // timedelta(microseconds=1)
+        elapsed = (moment - self.EPOCH) // timedelta(microseconds=1)
+        slot = self.EPOCH + timedelta(microseconds=(elapsed // step + 1) * step)
+        return slot.astimezone(moment.tzinfo)
+
+    def __str__(self):
+        return f"setiap {self.interval.total_seconds() / 60:g} menit"
+
+
+class JobRunStore:
+    """Last scheduled run of every job, kept in the outbox database so missed runs can be caught up after a restart."""
+
+    def __init__(self, outbox):
+        self.outbox = outbox
+        with outbox.transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS scheduler_runs (job TEXT PRIMARY KEY, last_run TEXT NOT NULL)")
+
+    def get(self, job_name):
+        with self.outbox.transaction() as conn:
+            row = conn.execute("SELECT last_run FROM scheduler_runs WHERE job = ?", (job_name,)).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def set(self, job_name, moment):
+        with self.outbox.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO scheduler_runs (job, last_run) VALUES (?, ?)", (job_name, moment.isoformat()))
+
+
+class ScheduledJob:
+    def __init__(self, name, func, triggers, max_concurrency=1, catch_up=True, exclusive=False):
+        self.name = name
+        self.func = func
+        self.triggers = triggers
+        self.max_concurrency = max_concurrency
+        self.catch_up = catch_up
+        self.exclusive = exclusive
+        self.running = 0
+
+    def next_after(self, moment):
+        return min(trigger.next_after(moment) for trigger in self.triggers)
+
+
+class AsyncScheduler:
+    """Runs jobs from an asyncio event loop, each run in a worker thread so a slow job never delays the others.
+
+    A job that falls due while `max_concurrency` runs of it are still going is skipped (skip-if-running).
+    Due times are spread by up to `jitter` random seconds, and a run missed while the process was down
+    is made up once at startup if it is at most `catch_up_grace` seconds late.
+
+    Runs of exclusive jobs are only started after `claim_run(job_name, due)` returns True, so with
+    several workers each scheduled run happens on exactly one of them.
+    """
+
+    def __init__(self, timezone, run_store=None, jitter=0, catch_up_grace=0, claim_run=None):
+        self.timezone = timezone
+        self.run_store = run_store
+        self.claim_run = claim_run
+        self.jitter = jitter
+        self.catch_up_grace = catch_up_grace
+        self.jobs = []
+        self._executor = None
+        self._tasks = set()
+
+    def add_job(self, name, func, *triggers, max_concurrency=1, catch_up=True, exclusive=False):
+        """Registers a job that is due whenever any of its CronSchedule/IntervalSchedule triggers fires."""
+        self.jobs.append(ScheduledJob(name, func, triggers, max_concurrency, catch_up, exclusive))
+
+    def now(self):
+        return datetime.now(self.timezone)
+
+    async def run(self):
+        """Runs every job forever."""
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(sum(job.max_concurrency for job in self.jobs), 1), thread_name_prefix="scheduler"
+        )
+        forever = asyncio.get_running_loop().create_future()
+        await asyncio.gather(forever, *(self._job_loop(job) for job in self.jobs))
+
+    def _missed_run(self, job, now):
+        """Returns the due time of a run missed while the process was down, if it should still be made up."""
+        last_run = self.run_store.get(job.name) if self.run_store and job.catch_up else None
+        if last_run is None:
+            return None
+        missed = job.next_after(last_run)
+        if missed > now:
+            return None
+        if (now - missed).total_seconds() > self.catch_up_grace:
+            print(f"⏭️ Run {job.name} pada {missed:%Y-%m-%d %H:%M} terlewat terlalu lama, tidak dijalankan ulang")
+            return None
+        print(f"⏪ Menjalankan {job.name} yang terlewat sejak {missed:%Y-%m-%d %H:%M}")
+        return missed
+
+    async def _job_loop(self, job):
+        now = self.now()
+        missed = self._missed_run(job, now)
+        if missed is not None:
+            self._start(job, missed)
+        due = job.next_after(now)
+        while True:
+            await self._sleep_until(due + timedelta(seconds=random.uniform(0, self.jitter)) if self.jitter > 0 else due)
+            self._start(job, due)
+            # Runs missed while the loop was blocked (e.g. a suspended host) collapse into this one
+            due = job.next_after(max(self.now(), due))
+
+    async def _sleep_until(self, moment):
+        # Short sleeps notice wall-clock adjustments instead of oversleeping them
+        while True:
+            remaining = (moment - self.now()).total_seconds()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, 60))
+
+    def _start(self, job, due):
+        if job.running >= job.max_concurrency:
+            print(f"⏭️ {job.name} dilewati karena run sebelumnya masih berjalan")
+            return
+        if job.exclusive and self.claim_run and not self.claim_run(job.name, due):
+            print(f"⏭️ {job.name} pada {due:%Y-%m-%d %H:%M} sudah dijalankan worker lain")
+            return
+        job.running += 1
+        if self.run_store:
+            self.run_store.set(job.name, due)
+        task = asyncio.ensure_future(self._execute(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, job):
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, job.func)
+        except Exception as e:
+            print(f"Error menjalankan job {job.name}: {e}")
+        finally:
+            job.running -= 1
+
+
+class LeaseBackend(ABC):
+    """Interface for named, expiring leases shared by every worker of a deployment."""
+
+    @abstractmethod
+    def acquire(self, name, owner, ttl):
+        """Takes lease `name` for `owner`, or renews it if `owner` already holds it, for `ttl` seconds.
+
+        Returns False while another owner holds an unexpired lease of that name.
+        """
+
+    @abstractmethod
+    def release(self, name, owner):
+        """Gives up a lease if `owner` holds it."""
+
+    @abstractmethod
+    def holders(self, prefix):
+        """Returns {lease name: owner} for every unexpired lease whose name starts with `prefix`."""
+
+
+class SqliteLeaseBackend(LeaseBackend):
+    """Leases in a SQLite file every worker can open (e.g. the shared STATE_DB_PATH)."""
+
+    # Expired leases are kept this long before being purged
+    PURGE_AFTER = 7 * 24 * 3600
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def acquire(self, name, owner, ttl):
+        now = time.time()
+        with self._lock, self._conn:
+            # The upsert only overwrites a lease that is ours or has expired, atomically across processes
+            cursor = self._conn.execute(
+                "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+                (name, owner, now + ttl, now),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, name, owner):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    def holders(self, prefix):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM leases WHERE expires_at < ?", (now - self.PURGE_AFTER,))
+            rows = self._conn.execute(
+                "SELECT name, owner FROM leases WHERE substr(name, 1, ?) = ? AND expires_at >= ?", (len(prefix), prefix, now)
+            ).fetchall()
+        return dict(rows)
+
+
+class FileLeaseBackend(LeaseBackend):
+    """Leases as small JSON files in a shared directory, updated under an exclusive flock."""
+
+    PURGE_AFTER = SqliteLeaseBackend.PURGE_AFTER
+
+    def __init__(self, directory):
+        if fcntl is None:
+            raise RuntimeError("COORDINATION_BACKEND=file membutuhkan fcntl (Linux/macOS)")
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        with self._lock, open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _path(self, name):
+        return os.path.join(self.directory, hashlib.sha1(name.encode()).hexdigest() + '.lease')
+
+    @staticmethod
+    def _read(path):
         try:
-            response = requests.post(telegram_url, json=payload)
-            response.raise_for_status()
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def acquire(self, name, owner, ttl):
+        now = time.time()
+        path = self._path(name)
+        with self._locked():
+            lease = self._read(path)
+            if lease and lease['owner'] != owner and lease['expires_at'] >= now:
+                return False
+            with open(path + '.tmp', 'w') as f:
+                json.dump({'name': name, 'owner': owner, 'expires_at': now + ttl}, f)
+            os.replace(path + '.tmp', path)
             return True
-        except requests.exceptions.RequestException as e:
-            print(f"Error mengirim pesan ke Telegram: {e}")
-            return False
+
+    def release(self, name, owner):
+        path = self._path(name)
+        with self._locked():
+            lease = self._read(path)
+            if lease and lease['owner'] == owner:
+                os.remove(path)
+
+    def holders(self, prefix):
+        now = time.time()
+        result = {}
+        with self._locked():
+            for file_name in os.listdir(self.directory):
+                if not file_name.endswith('.lease'):
+                    continue
+                path = os.path.join(self.directory, file_name)
+                lease = self._read(path)
+                if lease is None:
+                    continue
+                if lease['expires_at'] < now - self.PURGE_AFTER:
+                    os.remove(path)
+                elif lease['expires_at'] >= now and lease['name'].startswith(prefix):
+                    result[lease['name']] = lease['owner']
+        return result
+
+
+class WorkerCoordinator:
+    """Lets several bot workers share the work through a LeaseBackend without sending anything twice.
+
+    Every worker keeps a membership lease alive from a heartbeat thread. Databases are sharded across
+    the live members with rendezvous hashing, and a shard lease keeps two workers from polling the same
+    database while membership changes. Each run of an exclusive scheduled job is claimed by exactly one
+    worker, and leader roles (such as the notification dispatcher) fail over once their holder stops
+    renewing. Without a backend the worker runs standalone and owns everything.
+    """
+
+    MEMBER_PREFIX = 'member:'
+    # Run claims must outlive the scheduling jitter and the catch-up grace of every worker
+    RUN_CLAIM_TTL = 2 * 24 * 3600
+
+    def __init__(self, backend=None, worker_id=None, lease_ttl=30):
+        self.backend = backend
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_ttl = lease_ttl
+        self._held = set()
+        self._held_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    @property
+    def standalone(self):
+        return self.backend is None
+
+    def start(self):
+        """Registers this worker and keeps its leases alive from a background thread."""
+        if self.standalone:
+            return
+        self.backend.acquire(self.MEMBER_PREFIX + self.worker_id, self.worker_id, self.lease_ttl)
+        thread = threading.Thread(target=self._heartbeat, name="coordination-heartbeat")
+        thread.daemon = True
+        thread.start()
+        print(f"🤝 Worker {self.worker_id} bergabung ({len(self.members())} worker aktif)")
+
+    def stop(self):
+        """Releases every lease, so other workers take over right away instead of after the TTL."""
+        if self.standalone:
+            return
+        self._stopped.set()
+        with self._held_lock:
+            held, self._held = self._held, set()
+        for name in held | {self.MEMBER_PREFIX + self.worker_id}:
+            self.backend.release(name, self.worker_id)
+
+    def _heartbeat(self):
+        while not self._stopped.wait(self.lease_ttl / 3):
+            try:
+                self.backend.acquire(self.MEMBER_PREFIX + self.worker_id, self.worker_id, self.lease_ttl)
+                with self._held_lock:
+                    held = list(self._held)
+                for name in held:
+                    if not self.backend.acquire(name, self.worker_id, self.lease_ttl):
+                        with self._held_lock:
+                            self._held.discard(name)
+            except Exception as e:
+                print(f"Error memperbarui lease koordinasi: {e}")
+
+    def _hold(self, name):
+        if self.backend.acquire(name, self.worker_id, self.lease_ttl):
+            with self._held_lock:
+                self._held.add(name)
+            return True
+        with self._held_lock:
+            self._held.discard(name)
+        return False
+
+    def _let_go(self, name):
+        with self._held_lock:
+            held = name in self._held
+            self._held.discard(name)
+        if held:
+            self.backend.release(name, self.worker_id)
+
+    def members(self):
+        """Returns the ids of every live worker, including this one."""
+        if self.standalone:
+            return [self.worker_id]
+        return sorted(set(self.backend.holders(self.MEMBER_PREFIX).values()) | {self.worker_id})
+
+    def _preferred_owner(self, key, members):
+        # Rendezvous hashing: adding or removing a worker only moves the shards that worker gains or loses
+        return max(members, key=lambda member: hashlib.blake2b(f"{member}|{key}".encode(), digest_size=8).digest())
+
+    def owns(self, key):
+        """Returns True when this worker is responsible for the shard `key` (e.g. a database id)."""
+        if self.standalone:
+            return True
+        lease = f"shard:{key}"
+        if self._preferred_owner(key, self.members()) == self.worker_id:
+            return self._hold(lease)
+        self._let_go(lease)
+        return False
+
+    def is_leader(self, role):
+        """Returns True while this worker holds the leader lease of `role`."""
+        return self.standalone or self._hold(f"leader:{role}")
+
+    def claim_run(self, job_name, due):
+        """Returns True for exactly one worker per scheduled run of `job_name`."""
+        if self.standalone:
+            return True
+        return self.backend.acquire(f"run:{job_name}:{due.isoformat()}", self.worker_id, self.RUN_CLAIM_TTL)
+
+
+def create_coordinator():
+    """Builds the WorkerCoordinator from COORDINATION_BACKEND (empty for a single worker, sqlite or file)."""
+    backend_name = os.getenv('COORDINATION_BACKEND', '').lower()
+    state_db_path = os.getenv('STATE_DB_PATH', 'notion_bot.db')
+    if backend_name == 'sqlite':
+        backend = SqliteLeaseBackend(os.getenv('COORDINATION_PATH') or state_db_path)
+    elif backend_name == 'file':
+        backend = FileLeaseBackend(os.getenv('COORDINATION_PATH') or 'coordination')
+    elif backend_name:
+        raise ValueError(f"COORDINATION_BACKEND tidak dikenal: {backend_name}")
+    else:
+        backend = None
+    return WorkerCoordinator(backend, os.getenv('WORKER_ID') or None, float(os.getenv('LEASE_TTL_SECONDS', '30')))
+
 
 app = Flask(__name__)
 bot_status = {"status": "initializing", "last_check": None, "last_reminder": None}
+webhook_events = queue.Queue()
+webhook_deduplicator = WebhookDeduplicator()
 
 @app.route('/status')
 def status():
     return jsonify(bot_status)
 
+@app.route('/metrics')
+def metrics():
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/webhooks/notion', methods=['POST'])
+def notion_webhook():
+    """Receives Notion webhook events and queues page events for ingestion."""
+    body = request.get_data()
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return jsonify({"error": "invalid JSON"}), 400
+
+    secret = os.getenv('NOTION_WEBHOOK_SECRET')
+    # Subscription handshake: Notion sends the token once, and it becomes the signing secret.
+    # Once a secret is configured every request, a repeated handshake included, must be signed.
+    if 'verification_token' in payload and not secret:
+        print(f"🔑 Token verifikasi webhook Notion diterima: {payload['verification_token']}")
+        print("   Simpan token ini sebagai NOTION_WEBHOOK_SECRET lalu verifikasi langganan di Notion.")
+        return jsonify({"status": "ok"})
+
+    if not verify_notion_signature(secret, body, request.headers.get('X-Notion-Signature')):
+        return jsonify({"error": "invalid signature"}), 401
+
+    if 'verification_token' in payload:
+        return jsonify({"status": "ok"})
+
+    event_id = payload.get('id')
+    if event_id and webhook_deduplicator.is_duplicate(event_id):
+        return jsonify({"status": "duplicate"})
+
+    # Acknowledge right away; the page is fetched and diffed by the webhook worker
+    webhook_events.put(payload)
+    return jsonify({"status": "queued"}), 202
+
+def route_webhook_event(bots, event):
+    """Hands a webhook event to the bot watching the event's parent database.
+
+    With several workers only the worker owning a database's shard ingests its events, so a webhook
+    never diffs a page concurrently with the owner's poll. Events for other shards are forwarded to
+    their owner through the WebhookInbox.
+    """
+    parent = (event.get('data') or {}).get('parent') or {}
+    if parent.get('type') == 'database':
+        bots = [bot for bot in bots if bot._is_own_database(parent.get('id'))]
+    # Without a parent every bot checks the page itself and ignores pages from other databases
+    for bot in bots:
+        database_id = normalize_database_id(bot.notion_database_id)
+        if bot.resources.coordinator.owns(database_id):
+            bot.ingest_page_event(event)
+        else:
+            bot.resources.webhook_inbox.forward(database_id, event)
+
+def drain_forwarded_webhook_events(bots):
+    """Ingests the webhook events other workers forwarded for the databases this worker owns."""
+    for bot in bots:
+        database_id = normalize_database_id(bot.notion_database_id)
+        if not bot.resources.coordinator.owns(database_id):
+            continue
+        # Taken events are gone from the inbox; one that fails is still caught by the next reconciliation
+        for event in bot.resources.webhook_inbox.take(database_id):
+            bot.ingest_page_event(event)
+
+def run_webhook_worker(bots, forward_poll_interval=5):
+    """Feeds queued webhook events into the bots one at a time, preserving their arrival order.
+
+    Every `forward_poll_interval` seconds the events forwarded by other workers are ingested as well.
+    """
+    coordinated = any(not bot.resources.coordinator.standalone for bot in bots)
+    next_drain = time.monotonic()
+    while True:
+        try:
+            event = webhook_events.get(timeout=forward_poll_interval) if coordinated else webhook_events.get()
+        except queue.Empty:
+            event = None
+        if event is not None:
+            try:
+                route_webhook_event(bots, event)
+            except Exception as e:
+                print(f"Error memproses event webhook: {e}")
+            finally:
+                webhook_events.task_done()
+        if coordinated and time.monotonic() >= next_drain:
+            next_drain = time.monotonic() + forward_poll_interval
+            try:
+                drain_forwarded_webhook_events(bots)
+            except Exception as e:
+                print(f"Error memproses event webhook yang diteruskan: {e}")
+
 def run_flask_app():
     app.run(host='0.0.0.0', port=3000)
 
 def main():
     """Fungsi utama"""
-    bot = NotionTelegramBot()
+    parser = argparse.ArgumentParser(description="Notion to Telegram task reminder bot")
+    parser.add_argument('--export-state', metavar='PATH', help="export the stored task state to a JSON file and exit")
+    parser.add_argument('--import-state', metavar='PATH', help="replace the stored task state with a JSON file and exit")
+    parser.add_argument('--database', metavar='ID_OR_NAME', help="database to export/import when several are configured (default: the first)")
+    args = parser.parse_args()
+
+    # One worker process watches every configured database, sharing HTTP pools, rate limiters and the outbox
+    coordinator = create_coordinator()
+    if not coordinator.standalone and os.getenv('STATE_BACKEND', 'sqlite').lower() == 'json':
+        print("⚠️ Koordinasi beberapa worker membutuhkan STATE_BACKEND=sqlite dengan STATE_DB_PATH bersama")
+    resources = BotResources(coordinator)
+    bots = [NotionTelegramBot(database_config, resources) for database_config in load_database_configs()]
+    print(f"📚 Memantau {len(bots)} database: {', '.join(str(bot.name) for bot in bots)}")
+
+    bot = bots[0]
+    if args.database:
+        bot = next((b for b in bots if b._is_own_database(args.database) or b.name == args.database), None)
+        if bot is None:
+            parser.error(f"database {args.database} tidak ditemukan di konfigurasi")
+
+    if args.export_state:
+        bot.state_store.export_json(args.export_state)
+        print(f"📤 State diekspor ke {args.export_state}")
+        return
+    if args.import_state:
+        imported = bot.state_store.import_json(args.import_state)
+        print(f"📥 {imported} tugas diimpor dari {args.import_state}")
+        return
 
     # Konfigurasi penjadwalan
+    timezone = pytz.timezone(os.getenv('TIMEZONE', 'UTC'))
+    schedule_cron = os.getenv("SCHEDULE_CRON", "") # Cron expressions separated by ';'
     schedule_time = os.getenv("SCHEDULE_TIME", "") # Default to empty string
     schedule_interval_minutes = int(os.getenv("SCHEDULE_INTERVAL_MINUTES", "0")) # Default to 0 minutes
     change_check_interval = int(os.getenv("CHANGE_CHECK_INTERVAL", "1")) # Default to 1 minute
-
+    webhook_enabled = bool(os.getenv("NOTION_WEBHOOK_SECRET"))
+    if webhook_enabled:
+        # Webhooks deliver the changes; polling only remains as a slow safety reconciliation
+        change_check_interval = int(os.getenv("WEBHOOK_RECONCILE_INTERVAL", "60"))
+
+    scheduler = AsyncScheduler(
+        timezone,
+        run_store=JobRunStore(resources.outbox),
+        jitter=float(os.getenv("SCHEDULE_JITTER_SECONDS", "0")),
+        catch_up_grace=float(os.getenv("SCHEDULE_CATCH_UP_MINUTES", "60")) * 60,
+        claim_run=coordinator.claim_run,
+    )
+
+    def run_reminders():
+        run_for_each_bot(bots, 'run_reminder')
+        update_bot_status("last_reminder")
+
+    polled_databases = set()
+
+    def check_changes():
+        # Databases are sharded across workers; each one is polled by a single worker at a time
+        owned = [bot for bot in bots if coordinator.owns(normalize_database_id(bot.notion_database_id))]
+        for bot in owned:
+            if bot.notion_database_id not in polled_databases:
+                # Another worker may have advanced the shared state while this one was not polling the database
+                bot.reset_sync_position()
+        polled_databases.clear()
+        polled_databases.update(bot.notion_database_id for bot in owned)
+        run_for_each_bot(owned, 'check_for_changes')
+        update_bot_status("last_check")
 
     # Jadwalkan pengingat tugas sesuai konfigurasi
-    if schedule_time:
-        schedule_times = [t.strip() for t in schedule_time.split(',') if t.strip()]
-        for s_time in schedule_times:
-            schedule.every().day.at(s_time).do(lambda: [bot.run_reminder(), update_bot_status("last_reminder")])
-            print(f"Pengingat tugas dijadwalkan setiap hari pada pukul {s_time}")
-    elif schedule_interval_minutes > 0:
-        schedule.every(schedule_interval_minutes).minutes.do(lambda: [bot.run_reminder(), update_bot_status("last_reminder")])
-        print(f"Pengingat tugas dijadwalkan setiap {schedule_interval_minutes} menit")
+    try:
+        if schedule_cron:
+            reminder_triggers = [CronSchedule(expression.strip(), timezone) for expression in schedule_cron.split(';') if expression.strip()]
+        elif schedule_time:
+            reminder_triggers = [CronSchedule.daily(s_time.strip(), timezone) for s_time in schedule_time.split(',') if s_time.strip()]
+        elif schedule_interval_minutes > 0:
+            reminder_triggers = [IntervalSchedule(schedule_interval_minutes)]
+        else:
+            reminder_triggers = []
+    except ValueError as e:
+        # A malformed schedule stops the bot with the offending entry instead of a traceback
+        parser.error(f"jadwal pengingat tidak valid: {e}")
+    if reminder_triggers:
+        # Every scheduled reminder is sent by exactly one worker
+        scheduler.add_job("reminder", run_reminders, *reminder_triggers, exclusive=True)
+        for trigger in reminder_triggers:
+            print(f"Pengingat tugas dijadwalkan {trigger}")
     else:
         print("Tidak ada jadwal pengingat yang ditentukan untuk pengingat tugas.")
-        # bot.run_reminder() # Run reminder once if no schedule is set
-        # update_bot_status("last_reminder")
 
     # Jadwalkan pengecekan perubahan secara dinamis
     if change_check_interval > 0:
-        schedule.every(change_check_interval).minutes.do(lambda: [bot.check_for_changes(), update_bot_status("last_check")])
+        scheduler.add_job("change_check", check_changes, IntervalSchedule(change_check_interval))
         print(f"Pengecekan perubahan Notion dijadwalkan setiap {change_check_interval} menit.")
     else:
         print("Tidak ada jadwal pengecekan perubahan yang ditentukan. Menjalankan pengecekan perubahan sekali.")
-        bot.check_for_changes() # Run change check once if no schedule is set
-        update_bot_status("last_check")
-
+        check_changes() # Run change check once if no schedule is set
 
     # Start Flask app in a separate thread
     flask_thread = threading.Thread(target=run_flask_app)
@@ -495,16 +2852,30 @@ def main():
     flask_thread.start()
     print("Server Flask berjalan di http://0.0.0.0:3000/status")
 
+    webhook_thread = threading.Thread(target=run_webhook_worker, args=(bots,), name="notion-webhook-worker")
+    webhook_thread.daemon = True
+    webhook_thread.start()
+    if webhook_enabled:
+        print("Webhook Notion aktif di http://0.0.0.0:3000/webhooks/notion")
+
+    coordinator.start()
     bot_status["status"] = "running"
 
     try:
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+        asyncio.run(scheduler.run())
     except KeyboardInterrupt:
+        coordinator.stop()
         print("\nBot dihentikan.")
         bot_status["status"] = "stopped"
 
+def run_for_each_bot(bots, method_name):
+    """Runs a job for every watched database, so one failing database does not stop the others."""
+    for bot in bots:
+        try:
+            getattr(bot, method_name)()
+        except Exception as e:
+            print(f"Error menjalankan {method_name} untuk database {bot.name}: {e}")
+
 def update_bot_status(event_type):
     global bot_status
     current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -0,0 +1,28 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from main import MetricsRegistry  # noqa: E402
+
+
+def test_render_keeps_full_float_precision():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('job_seconds', "Job duration", ['job'], buckets=(1, 10))
+    histogram.observe(123456.789, job='reminder')
+    counter = registry.counter('events_total', "Events", ['kind'])
+    counter.inc(kind='new')
+    counter.inc(0.5, kind='partial')
+    gauge = registry.gauge('pending', "Pending rows")
+    gauge.set_function(lambda: float('inf'))
+
+    lines = registry.render().splitlines()
+
+    assert '# TYPE job_seconds histogram' in lines
+    assert 'job_seconds_bucket{job="reminder",le="10.0"} 0' in lines
+    assert 'job_seconds_bucket{job="reminder",le="+Inf"} 1' in lines
+    assert 'job_seconds_count{job="reminder"} 1' in lines
+    assert 'job_seconds_sum{job="reminder"} 123456.789' in lines
+    assert 'events_total{kind="new"} 1' in lines
+    assert 'events_total{kind="partial"} 0.5' in lines
+    assert 'pending +Inf' in lines
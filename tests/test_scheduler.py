@@ -0,0 +1,50 @@
+import asyncio
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+
+import pytz
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from main import AsyncScheduler, IntervalSchedule, SqliteLeaseBackend, WorkerCoordinator  # noqa: E402
+
+
+def test_interval_slots_do_not_depend_on_the_start_time():
+    schedule = IntervalSchedule(0.02)
+    started = datetime(2025, 6, 1, 8, 0, 0, 123456, tzinfo=pytz.utc)
+    due = schedule.next_after(started)
+    assert due > started
+    assert schedule.next_after(due - timedelta(milliseconds=1)) == due
+    assert schedule.next_after(due) - due == schedule.interval
+
+
+def test_exclusive_interval_job_runs_once_per_slot_across_workers(tmp_path):
+    backend = SqliteLeaseBackend(str(tmp_path / 'leases.db'))
+    runs = []
+    lock = threading.Lock()
+
+    def scheduler_for(worker_id):
+        coordinator = WorkerCoordinator(backend, worker_id=worker_id)
+        scheduler = AsyncScheduler(pytz.utc, claim_run=coordinator.claim_run)
+
+        def job():
+            with lock:
+                runs.append(worker_id)
+
+        scheduler.add_job("reminder", job, IntervalSchedule(0.02), exclusive=True)
+        return scheduler
+
+    async def run_both():
+        schedulers = [scheduler_for('w1'), scheduler_for('w2')]
+        try:
+            await asyncio.wait_for(asyncio.gather(*(scheduler.run() for scheduler in schedulers)), timeout=5)
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.sleep(0.2)
+
+    asyncio.run(run_both())
+    claims = backend.holders('run:reminder:')
+    assert 3 <= len(runs) <= 5
+    assert len(runs) == len(claims)
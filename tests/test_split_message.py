@@ -0,0 +1,44 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from main import MessageRenderer, TaskSnapshot, escape_markdown, split_message  # noqa: E402
+
+
+def unescaped(chunk, marker):
+    """Counts the occurrences of `marker` that are not protected by a backslash."""
+    count = i = 0
+    while i < len(chunk):
+        if chunk[i] == '\\':
+            i += 2
+            continue
+        count += chunk[i] == marker
+        i += 1
+    return count
+
+
+def snapshot(description):
+    return TaskSnapshot('2025-06-01T00:00:00.000Z', 'https://www.notion.so/task', 'Task', 'Bug', 'Budi',
+                        '2025-06-01', 'In Progress', 'High', description, '10')
+
+
+def test_multiline_code_span_is_closed_and_reopened_across_chunks():
+    old = "\n".join(f"langkah {i}: cek_api (v1)" for i in range(900))
+    new = old.replace("v1", "v2")
+    message = MessageRenderer('id').render_change(snapshot(old), snapshot(new))
+    chunks = split_message(message, 4096)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert len(chunk) <= 4096
+        assert unescaped(chunk, '`') % 2 == 0
+        assert unescaped(chunk, '*') % 2 == 0
+
+
+def test_overlong_line_never_splits_an_escape():
+    line = "📝 *Deskripsi:* " + escape_markdown("a_b (c). [x] " * 400)
+    chunks = split_message(line, 100)
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert all((len(chunk) - len(chunk.rstrip('\\'))) % 2 == 0 for chunk in chunks)
+    assert "".join(chunks) == line
+    assert split_message("\\." * 300, 101)[0] == "\\." * 50
@@ -0,0 +1,62 @@
+"""Measures the cost of rendering notifications with the compiled message templates.
+
+Contoh:
+    python tools/bench_render.py --tasks 1000 --locale id
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from main import MessageRenderer, TaskSnapshot  # noqa: E402
+
+SPECIAL_TEXT = "fix_bug *urgent* (v1.2) [api] - cek #42!"
+
+
+def build_snapshots(count, seed=0):
+    """Builds synthetic task snapshots, some of them with MarkdownV2 special characters."""
+    rng = random.Random(seed)
+    snapshots = []
+    for i in range(count):
+        title = SPECIAL_TEXT if i % 3 == 0 else f"Task {i}"
+        snapshots.append(TaskSnapshot(
+            '2025-06-01T00:00:00.000Z', f'https://www.notion.so/task-{i}', title,
+            rng.choice(['Bug', 'Feature', 'Chore']), rng.choice(['Budi', 'Sari', 'Budi, Sari']),
+            '2025-06-0%d' % rng.randint(1, 9), rng.choice(['Not Started', 'In Progress', 'Done']),
+            rng.choice(['High', 'Low', 'N/A']), SPECIAL_TEXT * rng.randint(0, 4) or 'N/A', str(rng.randint(0, 100)),
+        ))
+    return snapshots
+
+
+def report(name, seconds, messages, unit='pesan'):
+    print(f"{name:<22} {seconds * 1e6 / messages:8.2f} µs/{unit}  ({messages} {unit}, {seconds * 1e3:.1f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark notification rendering")
+    parser.add_argument('--tasks', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5, help="the best of this many runs is reported")
+    parser.add_argument('--locale', default='id')
+    args = parser.parse_args()
+
+    renderer = MessageRenderer(args.locale)
+    snapshots = build_snapshots(args.tasks)
+    changed = build_snapshots(args.tasks, seed=1)
+    pairs = list(zip(snapshots, changed))
+
+    def best(func):
+        return min(timeit.repeat(func, number=1, repeat=args.repeat))
+
+    report("compile templates", best(lambda: MessageRenderer(args.locale)), 1, unit='kompilasi')
+    report("reminder (batch)", best(lambda: renderer.render_reminders(snapshots, 1, args.locale)), len(snapshots))
+    report("reminder (single)", best(lambda: [renderer.render_reminder(s, 1, args.locale) for s in snapshots]), len(snapshots))
+    report("new task", best(lambda: [renderer.render_new(s, args.locale) for s in snapshots]), len(snapshots))
+    report("change", best(lambda: [renderer.render_change(old, new, args.locale) for old, new in pairs]), len(pairs))
+    report("deleted", best(lambda: [renderer.render_deleted(s, args.locale) for s in snapshots]), len(snapshots))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""End-to-end benchmarks of the bot against the local stand-in server, without touching Notion or Telegram.
+
+For every database size the suite times the first sync, draining the notifications, an incremental
+poll, a full reconciliation, run_reminder and state export/import/load. It reports wall time, pages
+per second and memory. Results can be saved and compared against a baseline to catch regressions.
+
+Contoh:
+    python tools/bench_suite.py --sizes 1000,10000 --save bench.json
+    python tools/bench_suite.py --sizes 1000,10000 --baseline bench.json --max-regression 0.25
+    python tools/bench_suite.py --sizes 100000 --latency 100 --rate-limit-every 50
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TOOLS_DIR, '..'))
+sys.path.insert(0, TOOLS_DIR)
+
+# The bot reads its configuration from the environment; values set here win over a local .env
+os.environ.update(
+    NOTION_TOKEN='bench-token', TELEGRAM_BOT_TOKEN='bench-token', TELEGRAM_CHAT_ID='bench-chat',
+    BOT_CONFIG='', STATE_BACKEND='sqlite', REMINDER_OFFSET_DAYS='0,1,-2', WEEKLY_HOLIDAYS='', SEND_ON_HOLIDAYS='True',
+    FULL_SYNC_INTERVAL='60', DIGEST_WINDOW_SECONDS='0', NOTIFICATION_QUEUE_SIZE='1000',
+    NOTION_RATE_LIMIT='100000', TELEGRAM_RATE_LIMIT='100000', TELEGRAM_CHAT_RATE_LIMIT='100000',
+    HTTP_MAX_RETRIES='10', OUTBOX_RETRY_BASE='0.1', OUTBOX_RETRY_MAX='1',
+)
+
+import main  # noqa: E402
+from mock_api_server import MockApiServer, SyntheticDatabase  # noqa: E402
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(name, size, func, trace_memory=False):
+    """Runs func once and returns its timing and memory figures."""
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - started
+    result = {'scenario': name, 'size': size, 'seconds': seconds, 'pages_per_second': size / seconds if seconds else None,
+              'peak_rss_mb': peak_rss_mb()}
+    if trace_memory:
+        result['peak_traced_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    return result
+
+
+def wait_for_outbox(outbox, dispatcher, timeout):
+    deadline = time.monotonic() + timeout
+    dispatcher.wake()
+    while outbox.pending():
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"outbox belum kosong setelah {timeout} detik ({outbox.pending()} pesan)")
+        time.sleep(0.05)
+
+
+def run_size(size, args):
+    """Runs every scenario against a fresh database of `size` pages and a fresh state file."""
+    database = SyntheticDatabase(size, seed=args.seed)
+    server = MockApiServer(database, latency=args.latency / 1000, rate_limit_every=args.rate_limit_every).start()
+    workdir = tempfile.mkdtemp(prefix='notion-bench-')
+    os.environ.update(
+        NOTION_API_URL=f"{server.url}/v1", TELEGRAM_API_URL=server.url, NOTION_DATABASE_ID=database.database_id,
+        STATE_DB_PATH=os.path.join(workdir, 'bench.db'), STATE_FILE=os.path.join(workdir, 'notion_state.json'),
+    )
+    resources = main.BotResources()
+    bot = main.NotionTelegramBot(main.load_database_configs()[0], resources)
+    drain = lambda: wait_for_outbox(resources.outbox, resources.dispatcher, args.drain_timeout)  # noqa: E731
+    export_path = os.path.join(workdir, 'export.json')
+    changed = int(size * args.change_fraction)
+
+    results = [measure('initial_sync', size, bot.check_for_changes, args.trace_memory)]
+    results.append(measure('drain_notifications', size, drain, args.trace_memory))
+
+    database.mutate(args.change_fraction)
+    results.append(measure('incremental_poll', changed, bot.check_for_changes, args.trace_memory))
+    drain()
+
+    bot.last_full_sync = None # Force the next check to scan the whole database
+    results.append(measure('full_reconcile', size, bot.check_for_changes, args.trace_memory))
+    results.append(measure('run_reminder', size, bot.run_reminder, args.trace_memory))
+    drain()
+
+    results.append(measure('state_export', size, lambda: bot.state_store.export_json(export_path), args.trace_memory))
+    results.append(measure('state_import', size, lambda: bot.state_store.import_json(export_path), args.trace_memory))
+    results.append(measure('state_load', size, lambda: main.SqliteStateStore(
+        resources.outbox, main.normalize_database_id(database.database_id)).page_ids(), args.trace_memory))
+
+    for result in results:
+        result['telegram_messages'] = server.stats['telegram_messages']
+        result['rate_limited'] = server.stats['rate_limited']
+    server.shutdown()
+    return results
+
+
+def compare(results, baseline, max_regression):
+    """Returns the scenarios that got slower than the baseline by more than max_regression."""
+    previous = {(result['scenario'], result['size']): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result['scenario'], result['size']))
+        if before and before['seconds'] > 0 and result['seconds'] > before['seconds'] * (1 + max_regression):
+            regressions.append((result, before))
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark the bot against a local Notion/Telegram stand-in")
+    parser.add_argument('--sizes', default='1000,10000', help="comma-separated database sizes (e.g. 1000,10000,100000)")
+    parser.add_argument('--latency', type=float, default=0, help="added latency per API request in milliseconds")
+    parser.add_argument('--rate-limit-every', type=int, default=0, help="answer every Nth API request with HTTP 429")
+    parser.add_argument('--change-fraction', type=float, default=0.01, help="share of pages edited before the incremental poll")
+    parser.add_argument('--drain-timeout', type=float, default=600)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trace-memory', action='store_true', help="report the tracemalloc peak per scenario (slower)")
+    parser.add_argument('--save', metavar='PATH', help="write the results to a JSON file")
+    parser.add_argument('--baseline', metavar='PATH', help="compare with results saved by --save and fail on regressions")
+    parser.add_argument('--max-regression', type=float, default=0.25, help="allowed slowdown against the baseline (0.25 = 25%%)")
+    parser.add_argument('--verbose', action='store_true', help="show the bot's own log output")
+    args = parser.parse_args()
+
+    out = sys.stdout
+    results = []
+    for size in (int(value) for value in args.sizes.split(',') if value.strip()):
+        print(f"⏱️ Menjalankan skenario untuk {size} halaman...", file=out, flush=True)
+        with open(os.devnull, 'w') as devnull, contextlib.ExitStack() as stack:
+            if not args.verbose:
+                stack.enter_context(contextlib.redirect_stdout(devnull))
+            results.extend(run_size(size, args))
+
+    print(f"\n{'skenario':<22}{'halaman':>9}{'detik':>10}{'halaman/s':>12}{'RSS MB':>9}" + (f"{'traced MB':>11}" if args.trace_memory else ''))
+    for result in results:
+        rate = f"{result['pages_per_second']:.0f}" if result['pages_per_second'] else '-'
+        line = f"{result['scenario']:<22}{result['size']:>9}{result['seconds']:>10.3f}{rate:>12}{result['peak_rss_mb']:>9.0f}"
+        if args.trace_memory:
+            line += f"{result['peak_traced_mb']:>11.1f}"
+        print(line)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n📄 Hasil disimpan ke {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        for result, before in regressions:
+            print(f"❌ Regresi {result['scenario']} ({result['size']} halaman): {before['seconds']:.3f}s -> {result['seconds']:.3f}s")
+        if regressions:
+            sys.exit(1)
+        print("✅ Tidak ada regresi dibanding baseline")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,290 @@
+"""Local stand-in for the Notion and Telegram APIs, serving a synthetic task database.
+
+Emulates the endpoints the bot uses: database schema, database query (with pagination and the
+last_edited_time / due date filters), single pages, page blocks, users and Telegram sendMessage. Latency and HTTP 429
+responses can be injected to exercise the retry paths.
+
+Contoh:
+    python tools/mock_api_server.py --pages 10000 --port 8080 --latency 50 --rate-limit-every 20
+    NOTION_API_URL=http://localhost:8080/v1 TELEGRAM_API_URL=http://localhost:8080 python main.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CATEGORIES = ['Bug', 'Feature', 'Chore', 'Research']
+PEOPLE = ['Budi', 'Sari', 'Andi', 'Dewi', 'Rizky']
+STATUSES = ['Not Started', 'In Progress', 'Done']
+PRIORITIES = ['High', 'Medium', 'Low']
+
+SCHEMA = {
+    'object': 'database',
+    'properties': {
+        'Task Name': {'type': 'title'}, 'Category': {'type': 'select'}, 'Assignee': {'type': 'people'},
+        'Due Date': {'type': 'date'}, 'Status': {'type': 'status'}, 'Priority': {'type': 'select'},
+        'Description': {'type': 'rich_text'}, 'Progress': {'type': 'number'},
+    },
+}
+
+
+def _timestamp(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def _text(content):
+    return {'type': 'text', 'text': {'content': content, 'link': None}, 'plain_text': content, 'href': None}
+
+
+class SyntheticDatabase:
+    """A deterministic database of `size` task pages, stored as compact rows and expanded into Notion JSON on request."""
+
+    def __init__(self, size, database_id='bench-database', seed=0):
+        self.database_id = database_id
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.version = 0
+        today = datetime.now(timezone.utc)
+        edited = today - timedelta(days=30)
+        self.rows = {}
+        for index in range(size):
+            self.rows[f'{index:08d}-0000-4000-8000-{seed:012d}'] = self._row(index, today, edited + timedelta(seconds=index))
+
+    def _row(self, index, today, edited):
+        rng = self.rng
+        return {
+            'last_edited_time': _timestamp(edited),
+            'title': f"Task {index}: {rng.choice(['fix', 'build', 'review'])}_{rng.choice(['api', 'ui', 'docs'])}",
+            'category': rng.choice(CATEGORIES),
+            'assignee': rng.sample(PEOPLE, rng.randint(1, 2)),
+            'due_date': (today + timedelta(days=rng.randint(-30, 30))).strftime('%Y-%m-%d'),
+            'status': rng.choice(STATUSES),
+            'priority': rng.choice(PRIORITIES + [None]),
+            'description': [rng.choice(['Cek ', 'Update ', '*Penting* ']) for _ in range(rng.randint(0, 3))],
+            'progress': rng.randint(0, 100),
+        }
+
+    def page(self, page_id):
+        """Returns the Notion page object for a row."""
+        row = self.rows[page_id]
+        return {
+            'object': 'page',
+            'id': page_id,
+            'url': f"https://www.notion.so/{page_id.replace('-', '')}",
+            'last_edited_time': row['last_edited_time'],
+            'parent': {'type': 'database_id', 'database_id': self.database_id},
+            'created_by': {'object': 'user', 'id': 'bench-user'},
+            'last_edited_by': {'object': 'user', 'id': 'bench-user'},
+            'properties': {
+                'Task Name': {'type': 'title', 'title': [_text(row['title'])]},
+                'Category': {'type': 'select', 'select': {'name': row['category']}},
+                'Assignee': {'type': 'people', 'people': [{'object': 'user', 'name': name} for name in row['assignee']]},
+                'Due Date': {'type': 'date', 'date': {'start': row['due_date'], 'end': None}},
+                'Status': {'type': 'status', 'status': {'name': row['status']}},
+                'Priority': {'type': 'select', 'select': {'name': row['priority']} if row['priority'] else None},
+                'Description': {'type': 'rich_text', 'rich_text': [_text(segment) for segment in row['description']]},
+                'Progress': {'type': 'number', 'number': row['progress']},
+            },
+        }
+
+    def blocks(self, page_id):
+        """Returns the top-level blocks of a row's page body."""
+        row = self.rows[page_id]
+        paragraphs = [f"{row['title']} - langkah {step}" for step in range(1, 4)]
+        return [{'object': 'block', 'type': 'paragraph', 'paragraph': {'rich_text': [_text(text)]}} for text in paragraphs]
+
+    def mutate(self, fraction=0.01, delete_fraction=0.0):
+        """Edits (and optionally deletes) a random share of the pages, stamping them with the current time."""
+        with self.lock:
+            page_ids = list(self.rows)
+            now = _timestamp(datetime.now(timezone.utc))
+            for page_id in self.rng.sample(page_ids, int(len(page_ids) * fraction)):
+                row = self.rows[page_id]
+                row['status'] = self.rng.choice([status for status in STATUSES if status != row['status']])
+                row['last_edited_time'] = now
+            for page_id in self.rng.sample(page_ids, int(len(page_ids) * delete_fraction)):
+                self.rows.pop(page_id, None)
+            self.version += 1
+
+    def query(self, query_filter):
+        """Returns the ids of the pages matching a Notion query filter, sorted like a stable cursor."""
+        with self.lock:
+            rows = list(self.rows.items())
+        matches = [page_id for page_id, row in rows if self._matches(row, query_filter)]
+        return sorted(matches)
+
+    def _matches(self, row, query_filter):
+        if not query_filter:
+            return True
+        if 'and' in query_filter:
+            return all(self._matches(row, condition) for condition in query_filter['and'])
+        if query_filter.get('timestamp') == 'last_edited_time':
+            return row['last_edited_time'] >= query_filter['last_edited_time']['on_or_after']
+        if 'date' in query_filter:
+            date = query_filter['date']
+            due_date = row['due_date']
+            return due_date >= date.get('on_or_after', '') and due_date <= date.get('on_or_before', '9999')
+        return True
+
+
+class MockApiServer(ThreadingHTTPServer):
+    """Threaded HTTP server answering Notion (/v1/...) and Telegram (/bot<token>/...) requests."""
+
+    daemon_threads = True
+
+    def __init__(self, database, host='127.0.0.1', port=0, latency=0.0, rate_limit_every=0, retry_after=0.05):
+        super().__init__((host, port), MockApiHandler)
+        self.database = database
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.stats = {'notion_requests': 0, 'telegram_messages': 0, 'rate_limited': 0}
+        self.sent_messages = []
+        self._counter_lock = threading.Lock()
+        # Filtered result sets per (filter, dataset version), so paging through a query stays O(page size)
+        self._results = {}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serves requests from a daemon thread and returns the server."""
+        thread = threading.Thread(target=self.serve_forever, name="mock-api-server")
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def count(self, key):
+        """Increments a request counter and returns True when this request should be answered with HTTP 429."""
+        with self._counter_lock:
+            self.stats[key] += 1
+            if self.rate_limit_every and self.stats[key] % self.rate_limit_every == 0:
+                self.stats['rate_limited'] += 1
+                return True
+            return False
+
+    def query_results(self, query_filter):
+        key = (json.dumps(query_filter, sort_keys=True), self.database.version)
+        results = self._results.get(key)
+        if results is None:
+            results = self._results[key] = self.database.query(query_filter)
+        return results
+
+
+class MockApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send each response in one write; split header/body writes stall keep-alive clients on delayed ACKs
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _rate_limited(self, key):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if not self.server.count(key):
+            return False
+        retry_after = self.server.retry_after
+        self._send_json(429, {'ok': False, 'error_code': 429, 'parameters': {'retry_after': retry_after}},
+                        headers={'Retry-After': str(retry_after)})
+        return True
+
+    def do_GET(self):
+        database = self.server.database
+        if re.fullmatch(r'/v1/databases/[^/]+', self.path):
+            if not self._rate_limited('notion_requests'):
+                self._send_json(200, SCHEMA)
+            return
+        match = re.fullmatch(r'/v1/pages/([^/]+)', self.path)
+        if match:
+            if self._rate_limited('notion_requests'):
+                return
+            if match.group(1) in database.rows:
+                self._send_json(200, database.page(match.group(1)))
+            else:
+                self._send_json(404, {'object': 'error', 'status': 404, 'code': 'object_not_found'})
+            return
+        match = re.fullmatch(r'/v1/blocks/([^/]+)/children(\?.*)?', self.path)
+        if match:
+            if self._rate_limited('notion_requests'):
+                return
+            if match.group(1) in database.rows:
+                self._send_json(200, {'object': 'list', 'results': database.blocks(match.group(1)),
+                                      'has_more': False, 'next_cursor': None})
+            else:
+                self._send_json(404, {'object': 'error', 'status': 404, 'code': 'object_not_found'})
+            return
+        match = re.fullmatch(r'/v1/users/([^/]+)', self.path)
+        if match:
+            if not self._rate_limited('notion_requests'):
+                self._send_json(200, {'object': 'user', 'id': match.group(1), 'type': 'person', 'name': match.group(1)})
+            return
+        self._send_json(404, {'object': 'error', 'status': 404, 'code': 'invalid_request_url'})
+
+    def do_POST(self):
+        body = self._read_json()
+        if re.fullmatch(r'/v1/databases/[^/]+/query', self.path):
+            if self._rate_limited('notion_requests'):
+                return
+            results = self.server.query_results(body.get('filter'))
+            start = int(body.get('start_cursor') or 0)
+            end = start + min(int(body.get('page_size', 100)), 100)
+            database = self.server.database
+            with database.lock:
+                pages = [database.page(page_id) for page_id in results[start:end] if page_id in database.rows]
+            has_more = end < len(results)
+            self._send_json(200, {'object': 'list', 'results': pages, 'has_more': has_more,
+                                  'next_cursor': str(end) if has_more else None})
+            return
+        if re.fullmatch(r'/bot[^/]+/sendMessage', self.path):
+            if self._rate_limited('telegram_messages'):
+                return
+            self.server.sent_messages.append(body)
+            self._send_json(200, {'ok': True, 'result': {'message_id': len(self.server.sent_messages)}})
+            return
+        self._send_json(404, {'ok': False, 'error_code': 404})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local Notion/Telegram stand-in server")
+    parser.add_argument('--pages', type=int, default=1000, help="number of synthetic pages in the database")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0, help="added latency per request in milliseconds")
+    parser.add_argument('--rate-limit-every', type=int, default=0, help="answer every Nth request with HTTP 429 (0 = never)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    database = SyntheticDatabase(args.pages, seed=args.seed)
+    server = MockApiServer(database, args.host, args.port, latency=args.latency / 1000, rate_limit_every=args.rate_limit_every)
+    print(f"Mock API berjalan di {server.url} dengan {args.pages} halaman")
+    print(f"  NOTION_API_URL={server.url}/v1 TELEGRAM_API_URL={server.url} NOTION_DATABASE_ID={database.database_id}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nStatistik: {server.stats}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Sends a signed, Notion-style webhook event to a locally running bot for testing.
+
+Contoh:
+    python tools/send_fake_webhook.py --page-id <page_id> --type page.properties_updated
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def build_event(event_type, page_id, database_id):
+    """Builds an event payload shaped like the ones Notion delivers."""
+    return {
+        "id": str(uuid.uuid4()),
+        "timestamp": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        "type": event_type,
+        "entity": {"id": page_id, "type": "page"},
+        "data": {"parent": {"id": database_id, "type": "database"}},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send a fake Notion webhook event to the bot")
+    parser.add_argument('--page-id', required=True)
+    parser.add_argument('--type', default='page.properties_updated',
+                        choices=['page.created', 'page.properties_updated', 'page.content_updated', 'page.deleted', 'page.undeleted'])
+    parser.add_argument('--database-id', default=os.getenv('NOTION_DATABASE_ID'))
+    parser.add_argument('--secret', default=os.getenv('NOTION_WEBHOOK_SECRET'))
+    parser.add_argument('--url', default='http://localhost:3000/webhooks/notion')
+    parser.add_argument('--repeat', type=int, default=1, help="send the same event several times to exercise deduplication")
+    args = parser.parse_args()
+
+    if not args.secret:
+        parser.error("--secret atau NOTION_WEBHOOK_SECRET harus diisi")
+
+    body = json.dumps(build_event(args.type, args.page_id, args.database_id)).encode('utf-8')
+    signature = 'sha256=' + hmac.new(args.secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    for _ in range(args.repeat):
+        response = requests.post(args.url, data=body, timeout=10,
+                                 headers={'Content-Type': 'application/json', 'X-Notion-Signature': signature})
+        print(f"{response.status_code} {response.text.strip()}")
+
+
+if __name__ == "__main__":
+    main()